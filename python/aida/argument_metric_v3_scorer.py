@@ -10,7 +10,6 @@ __version__ = "0.0.0.1"
 __date__    = "14 September 2022"
 
 from aida.container import Container
-from aida.type_role_filler import TypeRoleFiller
 from aida.score_printer import ScorePrinter
 from aida.scorer import Scorer
 from aida.argument_metric_score import ArgumentMetricScore
@@ -18,6 +17,8 @@ from aida.utility import multisort, get_cost_matrix
 from munkres import Munkres
 from tqdm import tqdm
 
+import copy
+
 class ArgumentMetricScorerV3(Scorer):
     """
     AIDA class for Argument Extraction evaluation metric scorer.
@@ -91,8 +92,7 @@ class ArgumentMetricScorerV3(Scorer):
         # normalized similarity
         def get_number_of_mentions(document_id, system_or_gold, trf):
             cluster_id = trf.get('filler_cluster_id')
-            cluster = self.get('cluster', system_or_gold, document_id, cluster_id)
-            return len(cluster.get('mentions'))
+            return self.get('cluster_features').get('number_of_mentions', system_or_gold, document_id, cluster_id)
         sim = self.get('Sim', document_id, gold_trf, system_trf)
         precision = sim/get_number_of_mentions(document_id, 'system', system_trf)
         recall = sim/get_number_of_mentions(document_id, 'gold', gold_trf)
@@ -100,31 +100,11 @@ class ArgumentMetricScorerV3(Scorer):
         return f1
 
     def get_document_types_role_fillers(self, system_or_gold, document_id):
-        def types_tostring(types):
-            return '{}{}{}'.format('{', ','.join(sorted(types)), '}')
-        logger = self.get('logger')
-        types_role_fillers = Container(logger)
-        responses = self.get('{}_responses'.format(system_or_gold))
-        if document_id in responses.get('document_frames'):
-            for frame in responses.get('document_frames').get(document_id).values():
-                subject_metatype = frame.get('metatype')
-                role_fillers = frame.get('role_fillers')
-                for role_name in role_fillers:
-                    for filler_cluster_id in role_fillers.get(role_name):
-                        for predicate_justification in role_fillers.get(role_name).get(filler_cluster_id):
-                            subject_types = set(frame.get('types').keys())
-                            trf_key = '{subject_cluster_id}:{filler_cluster_id}'.format(subject_cluster_id=frame.get('ID'),
-                                                                                        filler_cluster_id=filler_cluster_id)
-                            types_role_filler = types_role_fillers.get(trf_key, default=TypeRoleFiller(logger))
-                            types_role_filler.update('trf_id', trf_key, single_valued=True)
-                            types_role_filler.update('document_id', document_id, single_valued=True)
-                            types_role_filler.update('negation_status', predicate_justification.get('is_assertion_negated'))
-                            types_role_filler.update('subject_cluster_id', frame.get('ID'), single_valued=True)
-                            types_role_filler.update('subject_types', subject_types)
-                            types_role_filler.update('metatype', subject_metatype, single_valued=True)
-                            types_role_filler.update('role_name', role_name)
-                            types_role_filler.update('filler_cluster_id', filler_cluster_id, single_valued=True)
-                            types_role_filler.update('predicate_justifications', predicate_justification)
+        # the TRFs are shared by all the variants, so copy them before they are aligned
+        types_role_fillers = Container(self.get('logger'))
+        shared_types_role_fillers = self.get('cluster_features').get('document_types_role_fillers', system_or_gold, document_id)
+        for trf_key in shared_types_role_fillers:
+            types_role_fillers.add(key=trf_key, value=copy.copy(shared_types_role_fillers.get(trf_key)))
         return types_role_fillers
 
     def get_RolesPrecision(self, document_id, gold_trf, system_trf):
@@ -170,11 +150,11 @@ class ArgumentMetricScorerV3(Scorer):
     def get_Sim(self, document_id, gold_trf, system_trf):
         gold_filler_cluster_id = gold_trf.get('filler_cluster_id')
         system_filler_cluster_id = system_trf.get('filler_cluster_id')
-        document_cluster_alignment = self.get('cluster_alignment').get('system_to_gold').get(document_id)
-        if system_filler_cluster_id in document_cluster_alignment:
-            aligned_gold_cluster_id = document_cluster_alignment.get(system_filler_cluster_id).get('aligned_to')
+        alignment = self.get('cluster_features').get('alignment', 'system', document_id, system_filler_cluster_id)
+        if alignment is not None:
+            aligned_gold_cluster_id, aligned_similarity = alignment
             if gold_filler_cluster_id == aligned_gold_cluster_id:
-                return float(document_cluster_alignment.get(system_filler_cluster_id).get('aligned_similarity'))
+                return float(aligned_similarity)
         return 0
 
     def get_type_similarity(self, document_id, system_cluster_id, gold_cluster_id):
@@ -187,9 +167,14 @@ class ArgumentMetricScorerV3(Scorer):
     def get_TRFscore(self, document_id, gold_trf, system_trf):
         if gold_trf.get('metatype') != system_trf.get('metatype'):
             return 0
-        type_sim = self.get('TypeSim', document_id, gold_trf, system_trf)
-        roles_precision = self.get('RolesPrecision', document_id, gold_trf, system_trf)
-        cluster_sim = self.get('ClusterSim', document_id, gold_trf, system_trf)
+        # the similarities of a pair of TRFs do not depend on the variant, so they are shared
+        trf_similarities = self.get('cluster_features').get('trf_similarities')
+        key = (document_id, gold_trf.get('trf_id'), system_trf.get('trf_id'))
+        if key not in trf_similarities:
+            trf_similarities[key] = (self.get('TypeSim', document_id, gold_trf, system_trf),
+                                     self.get('RolesPrecision', document_id, gold_trf, system_trf),
+                                     self.get('ClusterSim', document_id, gold_trf, system_trf))
+        type_sim, roles_precision, cluster_sim = trf_similarities[key]
         trf_score = type_sim * roles_precision * cluster_sim
         self.record_event('TYPE_SIM_INFO', document_id, gold_trf.get('trf_id'), system_trf.get('trf_id'), type_sim)
         self.record_event('CLUSTER_SIM_INFO', document_id, gold_trf.get('trf_id'), system_trf.get('trf_id'), 'object', cluster_sim)
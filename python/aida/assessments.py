@@ -101,7 +101,7 @@ class Assessments(Container):
         path = '{}/data/TA2/*.tab'.format(self.assessments_dir)
         header =  FileHeader(self.logger, "\t".join(assessments.get('task2').get('across_documents_coreference').get('columns')))
         for filename in glob.glob(path):
-            for entry in FileHandler(self.logger, filename, header):
+            for entry in FileHandler(self.logger, filename, header, stream=True):
                 queryid, docid, mention_span, assessment_read, fqec_read, where = map(
                     lambda key: entry.get(key),
                     ['queryid', 'docid', 'mention_span', 'assessment', 'fqec', 'where']
@@ -143,6 +143,8 @@ class Assessments(Container):
         claim_mappings.load(self.get('claim_mappings_filename'))
         self.set('claim_mappings', claim_mappings)
         self.set('claims', claims)
+        # the cache of the features of the assessed claims used by the Task3 scorers
+        self.set('claim_features', {})
         for claim_mapping in claim_mappings.get('mappings'):
             condition = claim_mapping.get('condition')
             query_id = claim_mapping.get('query_id')
@@ -162,6 +164,35 @@ class Assessments(Container):
         claim_relations_filename = self.get('claim_relations_filename')
         if claim_relations_filename:
             self.set('cross_claim_relations', FileHandler(logger, claim_relations_filename))
+            self.load_cross_claim_relations_index()
+
+    def load_cross_claim_relations_index(self):
+        """
+        Indexes the cross claim relations by (query_claim_id, system_claim_id), and by query_claim_id.
+
+        When more than one relation is found for a pair of claims, only the first one is indexed by the pair.
+        """
+        cross_claim_relations_index = {}
+        cross_claim_relations_by_query = {}
+        for entry in self.get('cross_claim_relations'):
+            query_claim_id = entry.get('query_claim_id')
+            cross_claim_relations_index.setdefault((query_claim_id, entry.get('system_claim_id')), entry)
+            cross_claim_relations_by_query.setdefault(query_claim_id, []).append(entry)
+        self.set('cross_claim_relations_index', cross_claim_relations_index)
+        self.set('cross_claim_relations_by_query', cross_claim_relations_by_query)
+
+    def get_cross_claim_relation(self, query_claim_id, system_claim_id):
+        """
+        Returns the entry containing the cross claim relation between the query claim and the system claim,
+        or None if the relation was not assessed.
+        """
+        return self.get('cross_claim_relations_index').get((query_claim_id, system_claim_id))
+
+    def get_query_cross_claim_relations(self, query_claim_id):
+        """
+        Returns the list of entries containing the cross claim relations assessed for the query claim.
+        """
+        return self.get('cross_claim_relations_by_query').get(query_claim_id, [])
 
     def load_classquery_assessments(self): 
         next_fqec_num = 1001
@@ -170,7 +201,7 @@ class Assessments(Container):
         path = '{}/data/class/*/*.tab'.format(self.assessments_dir)
         header =  FileHeader(self.logger, "\t".join(assessments.get(query_type).get('columns')))   
         for filename in glob.glob(path):
-            for entry in FileHandler(self.logger, filename, header):
+            for entry in FileHandler(self.logger, filename, header, stream=True):
                 queryid, docid, mention_span, assessment_read, fqec_read, where = map(
                     lambda key: entry.get(key), 
                     ['queryid', 'docid', 'mention_span', 'assessment', 'fqec', 'where']
@@ -28,7 +28,7 @@ class ClusterAlignment(Object):
         for filename in tqdm(sorted(os.listdir(self.get('directory')), key=str), desc='loading cluster alignment'):
             filename_including_path = '{}/{}'.format(self.get('directory'), filename)
             document_id = filename.replace('.tab', '')
-            for entry in FileHandler(logger, filename_including_path):
+            for entry in FileHandler(logger, filename_including_path, stream=True):
                 system_cluster = entry.get('system_cluster')
                 gold_cluster = entry.get('gold_cluster')
                 similarity = entry.get('similarity')
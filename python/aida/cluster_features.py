@@ -0,0 +1,120 @@
+"""
+AIDA class for the features of clusters shared by the Task1 metric scorers.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida.container import Container
+from aida.object import Object
+from aida.type_role_filler import TypeRoleFiller
+
+class ClusterFeatures(Object):
+    """
+    The features of the gold and system clusters, and of their documents, used by the Task1
+    metric scorers.
+
+    ScoresManager creates a single instance of this class, and passes it to every Task1 scorer.
+    A feature is computed when it is asked for the first time, and is then reused by every
+    scorer variant instead of being recomputed by each of them.
+
+    The features of a cluster are: the number of its mentions, and the cluster it is aligned
+    to along with the similarity of the alignment. The features of a document are its
+    type-role-fillers (TRFs), and the similarity between each pair of gold and system TRFs.
+    """
+
+    def __init__(self, logger, gold_responses, system_responses, cluster_alignment):
+        """
+        Initializes this instance.
+
+        Arguments:
+            logger (aida.Logger):
+                the aida.Logger object.
+            gold_responses (aida.ResponseSet):
+                the gold responses.
+            system_responses (aida.ResponseSet):
+                the system responses.
+            cluster_alignment (aida.Container):
+                the alignment of gold and system clusters.
+        """
+        super().__init__(logger)
+        self.gold_responses = gold_responses
+        self.system_responses = system_responses
+        self.cluster_alignment = cluster_alignment
+        self.num_mentions = {}
+        self.alignments = {}
+        self.types_role_fillers = {}
+        self.trf_similarities = {}
+
+    def get_cluster(self, system_or_gold, document_id, cluster_id):
+        document_clusters = self.get('{}_responses'.format(system_or_gold)).get('document_clusters')
+        if document_id in document_clusters:
+            if cluster_id in document_clusters.get(document_id):
+                return document_clusters.get(document_id).get(cluster_id)
+        return None
+
+    def get_number_of_mentions(self, system_or_gold, document_id, cluster_id):
+        """
+        Returns the number of mentions of the cluster.
+        """
+        key = (system_or_gold, document_id, cluster_id)
+        num_mentions = self.get('num_mentions')
+        if key not in num_mentions:
+            cluster = self.get('cluster', system_or_gold, document_id, cluster_id)
+            num_mentions[key] = len(cluster.get('mentions'))
+        return num_mentions[key]
+
+    def get_alignment(self, system_or_gold, document_id, cluster_id):
+        """
+        Returns the tuple (aligned_to, aligned_similarity) corresponding to the cluster, or
+        None if the alignment has no entry for the cluster.
+        """
+        key = (system_or_gold, document_id, cluster_id)
+        alignments = self.get('alignments')
+        if key not in alignments:
+            alignment = None
+            direction = 'system_to_gold' if system_or_gold == 'system' else 'gold_to_system'
+            document_cluster_alignment = self.get('cluster_alignment').get(direction).get(document_id)
+            if document_cluster_alignment is not None and cluster_id in document_cluster_alignment:
+                cluster_alignment = document_cluster_alignment.get(cluster_id)
+                alignment = (cluster_alignment.get('aligned_to'), cluster_alignment.get('aligned_similarity'))
+            alignments[key] = alignment
+        return alignments[key]
+
+    def get_document_types_role_fillers(self, system_or_gold, document_id):
+        """
+        Returns the container mapping the TRF key to the TypeRoleFiller, built from the frames
+        in the document.
+
+        The TypeRoleFiller objects returned are shared, and must therefore be copied by a
+        scorer that modifies them.
+        """
+        key = (system_or_gold, document_id)
+        if key not in self.get('types_role_fillers'):
+            logger = self.get('logger')
+            types_role_fillers = Container(logger)
+            responses = self.get('{}_responses'.format(system_or_gold))
+            if document_id in responses.get('document_frames'):
+                for frame in responses.get('document_frames').get(document_id).values():
+                    subject_metatype = frame.get('metatype')
+                    role_fillers = frame.get('role_fillers')
+                    for role_name in role_fillers:
+                        for filler_cluster_id in role_fillers.get(role_name):
+                            for predicate_justification in role_fillers.get(role_name).get(filler_cluster_id):
+                                subject_types = set(frame.get('types').keys())
+                                trf_key = '{subject_cluster_id}:{filler_cluster_id}'.format(subject_cluster_id=frame.get('ID'),
+                                                                                            filler_cluster_id=filler_cluster_id)
+                                types_role_filler = types_role_fillers.get(trf_key, default=TypeRoleFiller(logger))
+                                types_role_filler.update('trf_id', trf_key, single_valued=True)
+                                types_role_filler.update('document_id', document_id, single_valued=True)
+                                types_role_filler.update('negation_status', predicate_justification.get('is_assertion_negated'))
+                                types_role_filler.update('subject_cluster_id', frame.get('ID'), single_valued=True)
+                                types_role_filler.update('subject_types', subject_types)
+                                types_role_filler.update('metatype', subject_metatype, single_valued=True)
+                                types_role_filler.update('role_name', role_name)
+                                types_role_filler.update('filler_cluster_id', filler_cluster_id, single_valued=True)
+                                types_role_filler.update('predicate_justifications', predicate_justification)
+            self.get('types_role_fillers')[key] = types_role_fillers
+        return self.get('types_role_fillers')[key]
@@ -29,7 +29,7 @@ class ClusterSelfSimilarities(Object):
         for filename in tqdm(sorted(os.listdir(self.get('directory')), key=str), desc='loading cluster self-similarities'):
             filename_including_path = '{}/{}'.format(self.get('directory'), filename)
             document_id = filename.replace('.tab', '')
-            for entry in FileHandler(logger, filename_including_path):
+            for entry in FileHandler(logger, filename_including_path, stream=True):
                 metatype = entry.get('metatype')
                 system_or_gold1 = entry.get('system_or_gold1')
                 system_or_gold2 = entry.get('system_or_gold2')
@@ -13,17 +13,23 @@ from aida.container import Container
 from aida.file_handler import FileHandler
 from aida.cluster import Cluster
 from aida.event_or_relation_frame import EventOrRelationFrame
-from aida.utility import get_cost_matrix, get_intersection_over_union
-from munkres import Munkres
+from aida.packed_mentions import PackedMentions, get_intersection_over_union_matrix
+from aida.utility import get_assignment, get_intersection_over_union
+
+import numpy as np
 
 class Clusters(Object):
     """
     The container to hold Clusters.
     """
 
-    def __init__(self, logger, document_mappings, document_boundaries, annotated_regions, gold_mentions_filename, gold_edges_filename, system_mentions_filename, system_edges_filename, thresholds, weighted='no'):
+    def __init__(self, logger, document_mappings, document_boundaries, annotated_regions, gold_mentions_filename, gold_edges_filename, system_mentions_filename, system_edges_filename, thresholds, weighted='no', vectorized=False):
         """
         Initialize the Clusters.
+
+        If vectorized is True, the intersection over union between the mentions of
+        a pair of clusters is computed using the vectorized kernel, otherwise it is
+        computed one pair of mentions at a time.
         """
         super().__init__(logger)
         self.document_mappings = document_mappings
@@ -37,6 +43,8 @@ class Clusters(Object):
         self.alignment = {'gold_to_system': {}, 'system_to_gold': {}}
         self.thresholds = thresholds
         self.weighted = weighted
+        self.vectorized = vectorized
+        self.packed_mentions_cache = {}
         self.load()
         self.align_clusters()
 
@@ -47,28 +55,82 @@ class Clusters(Object):
         return self.get('frames').get(gold_or_system).get(frame_id)
 
     def get_entities_and_events_similarities(self):
+        """
+        Returns the similarities between candidate pairs of alignable gold and system
+        entity and event clusters.
+
+        A pair of clusters is a candidate if the two clusters share a key in the inverted
+        index returned by get_entity_and_event_index. The similarity of a pair that
+        is not a candidate is implicitly 0, and therefore not included in the return value.
+        """
         similarities = {}
+        system_index = self.get('entity_and_event_index', 'system')
         for gold_cluster in self.get('clusters').get('gold').values():
             if not gold_cluster.is_alignable_entity_or_event(self.get('annotated_regions')): continue
-            for system_cluster in self.get('clusters').get('system').values():
-                if not system_cluster.is_alignable_entity_or_event(self.get('annotated_regions')): continue
-                similarity = 0
-                if gold_cluster.get('metatype') == system_cluster.get('metatype'):
-                    similarity = self.get('similarity', 'gold', gold_cluster, 'system', system_cluster)
-                if gold_cluster.get('ID') not in similarities:
-                    similarities[gold_cluster.get('ID')] = {}
-                similarities[gold_cluster.get('ID')][system_cluster.get('ID')] = similarity
+            system_cluster_ids = set()
+            for key in self.get('entity_and_event_index_keys', gold_cluster):
+                system_cluster_ids.update(system_index.get(key, []))
+            for system_cluster_id in sorted(system_cluster_ids):
+                system_cluster = self.get('cluster', 'system', system_cluster_id)
+                similarity = self.get('similarity', 'gold', gold_cluster, 'system', system_cluster)
+                similarities.setdefault(gold_cluster.get('ID'), {})[system_cluster_id] = similarity
         return similarities
 
+    def get_entity_and_event_index(self, gold_or_system):
+        """
+        Returns the inverted index mapping (document_element_id, metatype, top_level_type)
+        to the IDs of alignable entity and event clusters.
+
+        Two clusters that do not share a key cannot have a non-zero similarity because
+        they either have a different metatype, have no matching top level type, or have
+        no pair of mentions coming from the same document element.
+        """
+        index = {}
+        for cluster in self.get('clusters').get(gold_or_system).values():
+            if not cluster.is_alignable_entity_or_event(self.get('annotated_regions')): continue
+            for key in self.get('entity_and_event_index_keys', cluster):
+                index.setdefault(key, []).append(cluster.get('ID'))
+        return index
+
+    def get_entity_and_event_index_keys(self, cluster):
+        keys = set()
+        top_level_types = cluster.get('top_level_types')
+        for mention in cluster.get('mentions').values():
+            for top_level_type in top_level_types:
+                keys.add((mention.get('document_element_id'), cluster.get('metatype'), top_level_type))
+        return keys
+
     def get_relation_similarities(self):
+        """
+        Returns the similarities between candidate pairs of alignable gold and system
+        relation frames.
+
+        A pair of frames is a candidate if more than one filler of the system frame is
+        aligned to a filler of the gold frame with the same rolename. The similarity of
+        a pair that is not a candidate is implicitly 0, and therefore not included in
+        the return value.
+        """
         similarities = {}
+        gold_index = {}
         for gold_frame in self.get('frames').get('gold').values():
             if not gold_frame.is_alignable_relation(): continue
-            for system_frame in self.get('frames').get('system').values():
-                if not system_frame.is_alignable_relation(): continue
-                if gold_frame.get('ID') not in similarities:
-                    similarities[gold_frame.get('ID')] = {}
-                similarities[gold_frame.get('ID')][system_frame.get('ID')] = self.get('similarity', 'gold', gold_frame, 'system', system_frame)
+            for rolename in gold_frame.get('role_fillers'):
+                for gold_filler_id in gold_frame.get('role_fillers')[rolename]:
+                    gold_index.setdefault((rolename, gold_filler_id), []).append(gold_frame.get('ID'))
+        for system_frame in self.get('frames').get('system').values():
+            if not system_frame.is_alignable_relation(): continue
+            keys_by_gold_frame_id = {}
+            for rolename in system_frame.get('role_fillers'):
+                for system_filler_id in system_frame.get('role_fillers')[rolename]:
+                    gold_aligned_system_filler_mapping_object = self.get('alignment').get('system_to_gold').get(system_filler_id, None)
+                    if gold_aligned_system_filler_mapping_object is None: continue
+                    key = (rolename, gold_aligned_system_filler_mapping_object.get('aligned_to'))
+                    for gold_frame_id in gold_index.get(key, []):
+                        keys_by_gold_frame_id.setdefault(gold_frame_id, set()).add(key)
+            for gold_frame_id in sorted(keys_by_gold_frame_id):
+                if len(keys_by_gold_frame_id[gold_frame_id]) <= 1: continue
+                gold_frame = self.get('frame', 'gold', gold_frame_id)
+                similarities.setdefault(gold_frame_id, {})[system_frame.get('ID')] = self.get('similarity', 'gold', gold_frame, 'system', system_frame)
         return similarities
 
     def get_similarity(self, system_or_gold1, cluster_or_frame1, system_or_gold2, cluster_or_frame2):
@@ -188,20 +250,12 @@ class Clusters(Object):
                     mappings[filetype]['id_to_index'][mention.get('ID')] = index
                     mappings[filetype]['index_to_id'][index] = mention.get('ID')
                     index += 1
-            similarities = {}
-            for gold_mention in mentions['gold']:
-                document_element_id = gold_mention.get('document_element_id')
-                modality = self.get('document_mappings').get('modality', document_element_id)
-                language = self.get('document_mappings').get('language', document_element_id)
-                for system_mention in mentions['system']:
-                    if gold_mention.get('ID') not in similarities:
-                        similarities[gold_mention.get('ID')] = {}
-                    iou = get_intersection_over_union(gold_mention, system_mention)
-                    iou = 0 if iou < self.get('threshold', modality, language) else iou
-                    similarities[gold_mention.get('ID')][system_mention.get('ID')] = iou
-            cost_matrix = get_cost_matrix(similarities, mappings)
+            if self.get('vectorized'):
+                similarities = self.get('vectorized_mention_similarities', gold_cluster, system_cluster)
+            else:
+                similarities = self.get('mention_similarities', mentions)
             alignment = {'gold_mention': {}, 'system_mention': {}}
-            for gold_mention_index, system_mention_index in Munkres().compute(cost_matrix):
+            for gold_mention_index, system_mention_index in get_assignment(similarities, mappings):
                 gold_mention_id = mappings['gold']['index_to_id'][gold_mention_index]
                 system_mention_id = mappings['system']['index_to_id'][system_mention_index]
                 alignment['gold_mention'][gold_mention_id] = {'system_mention': system_mention_id, 'score': similarities[gold_mention_id][system_mention_id]}
@@ -216,6 +270,54 @@ class Clusters(Object):
                         similarity += similarities[gold_mention_id][system_mention_id]
         return similarity
 
+    def get_mention_similarities(self, mentions):
+        similarities = {}
+        for gold_mention in mentions['gold']:
+            document_element_id = gold_mention.get('document_element_id')
+            modality = self.get('document_mappings').get('modality', document_element_id)
+            language = self.get('document_mappings').get('language', document_element_id)
+            for system_mention in mentions['system']:
+                if gold_mention.get('ID') not in similarities:
+                    similarities[gold_mention.get('ID')] = {}
+                iou = get_intersection_over_union(gold_mention, system_mention)
+                iou = 0 if iou < self.get('threshold', modality, language) else iou
+                similarities[gold_mention.get('ID')][system_mention.get('ID')] = iou
+        return similarities
+
+    def get_packed_mentions(self, cluster):
+        """
+        Returns the mentions of the cluster packed into arrays; the packed
+        mentions are computed once per cluster and reused across cluster pairs.
+        """
+        if cluster not in self.get('packed_mentions_cache'):
+            self.get('packed_mentions_cache')[cluster] = PackedMentions(self.get('logger'), cluster.get('mentions').values())
+        return self.get('packed_mentions_cache').get(cluster)
+
+    def get_vectorized_mention_similarities(self, gold_cluster, system_cluster):
+        """
+        Vectorized counterpart of get_mention_similarities.
+
+        The whole matrix of intersection over union, with thresholds applied, is
+        computed in one call, and is then returned in the same form as returned
+        by get_mention_similarities.
+        """
+        gold_mentions = self.get('packed_mentions', gold_cluster)
+        system_mentions = self.get('packed_mentions', system_cluster)
+        similarities = {}
+        if len(system_mentions) == 0:
+            return similarities
+        thresholds = []
+        for mention in gold_mentions.get('mentions'):
+            document_element_id = mention.get('document_element_id')
+            modality = self.get('document_mappings').get('modality', document_element_id)
+            language = self.get('document_mappings').get('language', document_element_id)
+            thresholds.append(self.get('threshold', modality, language))
+        matrix = get_intersection_over_union_matrix(gold_mentions, system_mentions)
+        matrix[matrix < np.array(thresholds, dtype=np.float64)[:, None]] = 0
+        for gold_mention_id, row in zip(gold_mentions.get('ids'), matrix.tolist()):
+            similarities[gold_mention_id] = dict(zip(system_mentions.get('ids'), row))
+        return similarities
+
     def load(self):
         """
         Load the files containing mentions and edges.
@@ -254,8 +356,7 @@ class Clusters(Object):
     def record_alignment(self, similarities, mappings):
         if len(similarities) == 0:
             return
-        cost_matrix = get_cost_matrix(similarities, mappings)
-        for gold_cluster_index, system_cluster_index in Munkres().compute(cost_matrix):
+        for gold_cluster_index, system_cluster_index in get_assignment(similarities, mappings):
             gold_cluster = self.get('cluster', 'gold', mappings['gold']['index_to_id'][gold_cluster_index])
             system_cluster = self.get('cluster', 'system', mappings['system']['index_to_id'][system_cluster_index])
             similarity = self.lookup_similarity(similarities, gold_cluster.get('ID'), system_cluster.get('ID'))
@@ -0,0 +1,170 @@
+"""
+Column map shared by the compact entries of a tab-separated file.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida.object import Object
+from array import array
+
+import locale
+import os
+import re
+
+# the number of bytes read at a time when indexing the lines of a file
+INDEX_READ_SIZE = 1 << 20
+
+# the line endings recognized by a file opened in text mode using universal newlines
+LINE_ENDING = re.compile(rb'\r\n|\r|\n')
+
+# the column map whose file is open for reading lines; at most one such file is kept open
+OPEN_COLUMN_MAP = None
+
+class ColumnMap(Object):
+    """
+    The ColumnMap maps the names of the columns of a tab separated file to the
+    indexes of the corresponding values stored in an aida.CompactEntry.
+
+    In addition to the names in the header, a column may be given other names
+    (e.g. the names of the columns in the schema of the file). The map also holds
+    the values that are shared by all the entries of the file, and the indexes at
+    which the entries store the values of the attributes set on them.
+
+    The raw lines are not kept in memory: the byte offset at which each line starts
+    is indexed when a line is asked for the first time, and the line is then read
+    from the file at its offset. Neither the offsets nor the open file are pickled;
+    they are obtained again when a line is asked for after unpickling.
+    """
+
+    def __init__(self, logger, filename, header, encoding=None):
+        """
+        Initializes this instance.
+
+        Arguments:
+            logger (aida.Logger):
+                the aida.Logger object.
+            filename (str):
+                the name of the file including the path.
+            header (aida.FileHeader):
+                the header of the file.
+            encoding (str or None):
+                the encoding used for opening the file.
+        """
+        super().__init__(logger)
+        self.filename = filename
+        self.header = header
+        self.encoding = encoding
+        self.indexes = {}
+        self.attribute_indexes = {}
+        self.shared_values = {}
+        self.offsets = None
+        self.fd = None
+        for index, column_name in enumerate(header.get('columns')):
+            self.get('indexes')[column_name.strip()] = index
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['offsets'] = None
+        state['fd'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def add_aliases(self, aliases):
+        """
+        Adds the names provided in aliases as other names of the header columns.
+
+        Arguments:
+            aliases (list of str):
+                the list whose i-th element is the other name of the i-th column.
+        """
+        indexes = self.get('indexes')
+        for index, alias in enumerate(aliases):
+            indexes[alias] = index
+
+    def get_attribute_index(self, name):
+        """
+        Gets the index at which the compact entries of the file store the value of the
+        attribute, set on them, whose name matches the value stored in name.
+
+        The attributes are given indexes following those of the header columns, in the
+        order in which they are set for the first time.
+        """
+        attribute_indexes = self.get('attribute_indexes')
+        if name not in attribute_indexes:
+            attribute_indexes[name] = len(self.get('header').get('columns')) + len(attribute_indexes)
+        return attribute_indexes[name]
+
+    def get_line(self, lineno):
+        """
+        Gets the raw line at the line number provided.
+
+        The line is read from the file at its byte offset, and is returned the way it is
+        returned by a file opened in text mode using universal newlines, i.e. ending
+        with '\n' whether the line ends with '\n', '\r\n' or '\r'.
+        """
+        global OPEN_COLUMN_MAP
+        if self.get('offsets') is None:
+            self.index_lines()
+        if self.get('fd') is None:
+            if OPEN_COLUMN_MAP is not None:
+                OPEN_COLUMN_MAP.close()
+            self.fd = os.open(self.get('filename'), os.O_RDONLY)
+            OPEN_COLUMN_MAP = self
+        offsets = self.get('offsets')
+        # os.pread leaves the offset of the file unchanged, which is shared with forked processes
+        data = os.pread(self.get('fd'), offsets[lineno] - offsets[lineno - 1], offsets[lineno - 1])
+        line = data.decode(self.get('encoding') or locale.getpreferredencoding(False))
+        if line.endswith('\r\n'):
+            line = '{}\n'.format(line[:-2])
+        elif line.endswith('\r'):
+            line = '{}\n'.format(line[:-1])
+        return line
+
+    def index_lines(self):
+        """
+        Indexes the byte offset at which each line of the file starts.
+
+        Lines end the way they do for a file opened in text mode using universal
+        newlines, i.e. at '\n', '\r\n' or '\r'. The offset of the line at line
+        number i is stored at index i-1, and the offset of the end of the file is
+        stored last.
+        """
+        offsets = array('q', [0])
+        position = 0
+        with open(self.get('filename'), 'rb') as file:
+            while True:
+                data = file.read(INDEX_READ_SIZE)
+                if not data: break
+                while data.endswith(b'\r'):
+                    # keep '\r\n' within the same block
+                    byte = file.read(1)
+                    if not byte: break
+                    data += byte
+                for match in LINE_ENDING.finditer(data):
+                    offsets.append(position + match.end())
+                position += len(data)
+        if offsets[-1] != position:
+            offsets.append(position)
+        self.offsets = offsets
+
+    def close(self):
+        """
+        Closes the file, if it is open for reading lines.
+        """
+        global OPEN_COLUMN_MAP
+        if self.get('fd') is not None:
+            os.close(self.get('fd'))
+            self.fd = None
+        if OPEN_COLUMN_MAP is self:
+            OPEN_COLUMN_MAP = None
+
+    def set_shared_value(self, key, value):
+        """
+        Sets the value, shared by all the entries of the file, of the attribute whose name matches key.
+        """
+        self.get('shared_values')[key] = value
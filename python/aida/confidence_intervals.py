@@ -9,10 +9,26 @@ __date__    = "26 February 2021"
 from aida.object import Object
 from aida.file_handler import FileHandler
 from aida.container import Container
-from arch.bootstrap import IIDBootstrap
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import norm
 
+import multiprocessing
 import numpy as np
 import os
+import traceback
+
+# the maximum number of resample indices drawn at once by the bootstrap
+BOOTSTRAP_CHUNK_SIZE = 1 << 22
+
+WORKER_CONFIDENCE_INTERVALS = None
+
+def init_worker(confidence_intervals):
+    global WORKER_CONFIDENCE_INTERVALS
+    WORKER_CONFIDENCE_INTERVALS = confidence_intervals
+    confidence_intervals.get('logger').defer_events()
+
+def compute_confidence_intervals_in_worker(scores):
+    return WORKER_CONFIDENCE_INTERVALS.compute_confidence_intervals_in_worker(scores)
 
 class ConfidenceIntervals(Object):
     """
@@ -54,12 +70,18 @@ class ConfidenceIntervals(Object):
                              Default value: "0.9, 0.95, 0.99".
 
             seed_value:      Seed value for computing confidence interval (optional).
+
+            jobs:            Number of worker processes used for computing confidence
+                             intervals (optional). Default value: 1.
         """
         super().__init__(logger)
+        self.jobs = 1
         for key in kwargs:
             self.set(key, kwargs[key])
         self.scores = FileHandler(logger, self.get('input'))
         self.confidence_intervals = Container(logger)
+        self.custom_filter_strategy_columns_cache = {}
+        self.entries_indexes = {}
         self.widths = {}
         self.compute_confidences()
 
@@ -92,30 +114,45 @@ class ConfidenceIntervals(Object):
 
     def get_custom_filter_strategy_columns(self, primary_key):
         columns = [k for k,v in primary_key.items() if v=='ALL'] if primary_key is not None else []
-        for entry in self.get('scores'):
-            if not self.is_aggregate(entry):
-                for field_name in columns:
-                    if entry.get(field_name) == 'ALL':
-                        columns.remove(field_name)
-        return columns
+        key = tuple(columns)
+        if key not in self.get('custom_filter_strategy_columns_cache'):
+            for entry in self.get('scores'):
+                if not self.is_aggregate(entry):
+                    for field_name in columns:
+                        if entry.get(field_name) == 'ALL':
+                            columns.remove(field_name)
+            self.get('custom_filter_strategy_columns_cache')[key] = columns
+        return list(self.get('custom_filter_strategy_columns_cache')[key])
+
+    def get_entries_index(self, aggregate, field_names):
+        """
+        Returns the dictionary mapping the tuple containing the values of the fields, named
+        in field_names, of the primary key of an entry to the list of entries, in the order of
+        their appearance in the input, having the same values.
+
+        Only the entries whose aggregate status matches aggregate (unless it is None) are
+        included. The index is built, using a single pass over the scores, when it is asked for
+        the first time.
+        """
+        key = (aggregate, field_names)
+        if key not in self.get('entries_indexes'):
+            index = {}
+            for entry in self.get('scores'):
+                if aggregate is not None and aggregate != self.is_aggregate(entry):
+                    continue
+                entry_primary_key = self.get('primary_key', entry)
+                values = tuple([entry_primary_key.get(field_name) for field_name in field_names])
+                index.setdefault(values, []).append(entry)
+            self.get('entries_indexes')[key] = index
+        return self.get('entries_indexes')[key]
 
     def filter_entries(self, aggregate=None, primary_key=None):
-        entries = []
+        if primary_key is None:
+            return [entry for entry in self.get('scores') if aggregate is None or aggregate == self.is_aggregate(entry)]
         custom_filter_strategy_fields = self.get('custom_filter_strategy_columns', primary_key)
-        for entry in self.get('scores'):
-            if aggregate is not None and aggregate != self.is_aggregate(entry):
-                continue
-            if primary_key is not None:
-                entry_primary_key = self.get('primary_key', entry)
-                filter_out = False
-                for field_name in primary_key:
-                    if field_name not in custom_filter_strategy_fields:
-                        if primary_key[field_name] != entry_primary_key[field_name]:
-                            filter_out = True
-                if filter_out:
-                    continue
-            entries.append(entry)
-        return entries
+        field_names = tuple([field_name for field_name in primary_key if field_name not in custom_filter_strategy_fields])
+        values = tuple([primary_key[field_name] for field_name in field_names])
+        return list(self.get('entries_index', aggregate, field_names).get(values, []))
 
     def get_confidence_interval_sizes(self):
         return sorted([float(size) for size in self.get('sizes').split(',')], reverse=True)
@@ -124,16 +161,76 @@ class ConfidenceIntervals(Object):
         """
         Compute two sided bootstrap confidence interval
         """
-        def score(x):
-            return np.array([x.mean()])
+        return self.get('confidence_intervals_by_size', scores, {ci_size: replications}, ci_method=ci_method, seed_value=seed_value)[ci_size]
+
+    def get_confidence_intervals_by_size(self, scores, replications, ci_method='bca', seed_value=None):
+        """
+        Compute two sided bootstrap confidence intervals of the mean of scores, one for each size.
+
+        A single bootstrap is run with the largest number of replications, and the interval
+        corresponding to each size is computed using the means of the first replications[size]
+        resamples. Since a seeded bootstrap draws the same resamples every time, this gives
+        the same intervals as running a separate bootstrap for each size.
+
+        Arguments:
+            scores (list):
+                the list of scores.
+            replications (dict):
+                the dictionary mapping the size of the confidence interval to the number of
+                bootstrap replications to be used for it.
+            ci_method (str):
+                one of 'bca' or 'percentile'.
+            seed_value (int or None):
+                the seed of the random number generator.
+        """
         data = np.array([float(score) for score in scores])
         if min(data) == max(data):
-            return tuple([min(data), max(data)])
-        bs = IIDBootstrap(data)
-        if seed_value is not None:
-            bs.seed(seed_value)
-        ci = bs.conf_int(score, replications, method=ci_method, size=ci_size, tail='two')
-        return tuple([ci[0][0], ci[1][0]])
+            return {size: tuple([min(data), max(data)]) for size in replications}
+        means = self.get('bootstrap_means', data, max(replications.values()), seed_value)
+        confidence_intervals = {}
+        for size, num_replications in replications.items():
+            alpha = (1.0 - size) / 2
+            percentiles = np.array([alpha, 1.0 - alpha])
+            if ci_method == 'bca':
+                percentiles = self.get('bca_percentiles', data, means[:num_replications], percentiles)
+            elif ci_method != 'percentile':
+                self.record_event('DEFAULT_CRITICAL_ERROR', 'Unknown confidence interval method: {}'.format(ci_method))
+            lower, upper = np.percentile(means[:num_replications], list(100 * percentiles))
+            confidence_intervals[size] = tuple([lower, upper])
+        return confidence_intervals
+
+    def get_bootstrap_means(self, data, replications, seed_value=None):
+        """
+        Returns the array containing the mean of each of the bootstrap resamples of data.
+
+        The resample indices are drawn, in chunks of at most BOOTSTRAP_CHUNK_SIZE indices, from
+        numpy.random.default_rng(seed_value) in the same order as arch.bootstrap.IIDBootstrap
+        would draw them.
+        """
+        generator = np.random.default_rng(seed_value)
+        num_items = len(data)
+        chunk_replications = max(1, BOOTSTRAP_CHUNK_SIZE // num_items)
+        means = np.empty(replications)
+        for start in range(0, replications, chunk_replications):
+            end = min(start + chunk_replications, replications)
+            indices = generator.integers(num_items, size=(end - start, num_items), dtype=np.int64)
+            means[start:end] = data[indices].mean(axis=1)
+        return means
+
+    def get_bca_percentiles(self, data, means, percentiles):
+        """
+        Returns the percentiles, of the bootstrap means, adjusted for bias and acceleration.
+        """
+        proportion = (means < data.mean()).mean()
+        if proportion <= 0.0 or proportion >= 1.0:
+            self.record_event('DEFAULT_CRITICAL_ERROR', 'Bias of the bootstrap means cannot be corrected.')
+        bias = norm.ppf(proportion)
+        # the leave-one-out jackknife means
+        jackknife_means = (data.sum() - data) / (len(data) - 1)
+        deviations = jackknife_means.mean() - jackknife_means
+        acceleration = np.sum(deviations**3) / (6 * (np.sum(deviations**2) ** 1.5))
+        quantiles = norm.ppf(percentiles)
+        return norm.cdf(bias + (bias + quantiles) / (1.0 - acceleration * (bias + quantiles)))
 
     def get_macro_scores(self, scores):
         def mean_score(scores):
@@ -165,6 +262,8 @@ class ConfidenceIntervals(Object):
     def compute_confidences(self):
         logger = self.get('logger')
         processed = {}
+        primary_key_strs = []
+        tasks = []
         for aggregate_entry in self.filter_entries(aggregate=True, primary_key=None):
             primary_key = self.get('primary_key', aggregate_entry)
             primary_key_str = '.'.join([primary_key[fn] for fn in self.get('primary_key_col').split(',')])
@@ -174,10 +273,55 @@ class ConfidenceIntervals(Object):
                 scores = self.get('macro_scores', scores)
             else:
                 scores = self.get('micro_scores', scores)
-            for size in [float(s.strip()) for s in self.get('sizes').split(',')]:
-                confidence_interval = self.get('confidence_interval', scores, ci_size=size, replications=self.get('num_replications', size), seed_value=self.get('seed_value'))
-                self.get('confidence_intervals').get(primary_key_str, default=Container(logger)).add(key=str(size), value=confidence_interval)
+            primary_key_strs.append(primary_key_str)
+            tasks.append(scores)
             processed[primary_key_str] = True
+        if self.get('jobs') > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=self.get('jobs'), mp_context=multiprocessing.get_context('fork'), initializer=init_worker, initargs=(self,)) as executor:
+                results = executor.map(compute_confidence_intervals_in_worker, tasks)
+                for primary_key_str in primary_key_strs:
+                    confidence_intervals, deferred_events, error = next(results)
+                    if error is not None:
+                        # the confidence intervals not yet started are not computed, since
+                        # the critical error recorded below exits
+                        executor.shutdown(cancel_futures=True)
+                    logger.record_deferred_events(deferred_events)
+                    if error is not None:
+                        self.record_event('DEFAULT_CRITICAL_ERROR', 'computing confidence intervals for {} failed\n{}'.format(primary_key_str, error))
+                    self.add_confidence_intervals_by_size(primary_key_str, confidence_intervals)
+        else:
+            for primary_key_str, scores in zip(primary_key_strs, tasks):
+                self.add_confidence_intervals_by_size(primary_key_str, self.compute_confidence_intervals(scores))
+
+    def compute_confidence_intervals(self, scores):
+        """
+        Returns the dictionary mapping each of the sizes to the confidence interval computed using the scores.
+
+        Each bootstrap is seeded using seed_value, so that the confidence intervals do not depend
+        on the order in which, or the process by which, they are computed.
+        """
+        sizes = [float(s.strip()) for s in self.get('sizes').split(',')]
+        replications = {size: self.get('num_replications', size) for size in sizes}
+        return self.get('confidence_intervals_by_size', scores, replications, seed_value=self.get('seed_value'))
+
+    def compute_confidence_intervals_in_worker(self, scores):
+        """
+        Returns the tuple (confidence_intervals, deferred_events, error).
+
+        This method is called in a worker process, which works on a copy of this instance.
+        """
+        confidence_intervals = None
+        error = None
+        try:
+            confidence_intervals = self.compute_confidence_intervals(scores)
+        except BaseException:
+            error = traceback.format_exc()
+        return confidence_intervals, self.get('logger').get_deferred_events(), error
+
+    def add_confidence_intervals_by_size(self, primary_key_str, confidence_intervals):
+        logger = self.get('logger')
+        for size in [float(s.strip()) for s in self.get('sizes').split(',')]:
+            self.get('confidence_intervals').get(primary_key_str, default=Container(logger)).add(key=str(size), value=confidence_intervals[size])
 
     def get_score_header(self, header, score=None, sizes=None):
         if score is None and len(sizes) == 0:
@@ -9,7 +9,10 @@ __status__  = "production"
 __version__ = "0.0.0.1"
 __date__    = "2 January 2020"
 
-from aida.object import Object
+from aida.object import BaseObject, Object
+
+# the value stored by a compact entry for an attribute not set on it
+UNSET = object()
 
 class Entry(Object):
     """
@@ -55,3 +58,120 @@ class Entry(Object):
 
     def __str__(self):
         return '{}\n'.format('\t'.join([self.get(column) for column in self.get('schema').get('columns')]))
+
+class CompactEntry(BaseObject):
+    """
+    The compact representation of a line in a tab separated file.
+
+    The values are stored in a list, and are looked up by name through the
+    aida.ColumnMap shared by all the entries of the file. The location (where),
+    the header and the raw line are obtained from the column map when needed.
+
+    The instances have no per-instance dictionary: the value of an attribute set on
+    an entry is stored in the list of values, following the values of the header
+    columns, at the index given to the attribute by the column map.
+
+    Attributes set on the entry take precedence over the values of the header
+    columns and over the values shared by all the entries of the file.
+    """
+
+    __slots__ = ('logger', 'column_map', 'lineno', 'values')
+
+    def __init__(self, logger, column_map, values, lineno):
+        """
+        Initializes this instance.
+
+        Arguments:
+            logger (aida.Logger):
+                the aida.Logger object.
+            column_map (aida.ColumnMap):
+                the column map shared by all the entries of the file.
+            values (list of str):
+                the list representing values corresponding to the header fields.
+            lineno (int):
+                the line number which this instance corresponds to.
+        """
+        self.logger = logger
+        self.column_map = column_map
+        self.lineno = lineno
+        num_columns = len(column_map.get('header').get('columns'))
+        if num_columns != len(values):
+            logger.record_event('UNEXPECTED_NUM_COLUMNS', num_columns, len(values), self.get('where'))
+        self.values = [value.strip() for value in values]
+
+    def get(self, *args, **kwargs):
+        """
+        Gets the value for the key using the given args.
+
+        The getters are tried first followed by the attributes set on this
+        instance, the value of the column whose name matches the key, and
+        the value shared by all the entries of the file.
+        """
+        key = args[0]
+        if key in self.getter_method_names:
+            return super().get(*args, **kwargs)
+        column_map = self.column_map
+        values = self.values
+        index = column_map.attribute_indexes.get(key)
+        if index is not None and index < len(values) and values[index] is not UNSET:
+            return values[index]
+        index = column_map.indexes.get(key)
+        if index is not None:
+            value = values[index] if index < len(values) else None
+            return None if value is UNSET else value
+        shared_values = column_map.shared_values
+        if key in shared_values:
+            return shared_values[key]
+        if isinstance(key, str) and key not in self.class_attribute_names:
+            return None
+        return super().get(*args, **kwargs)
+
+    def set(self, key, value):
+        """
+        Sets the value of the attribute whose name matches the value stored in key.
+        """
+        if key in CompactEntry.__slots__:
+            super().set(key, value)
+            return
+        index = self.column_map.get('attribute_index', key)
+        values = self.values
+        if index >= len(values):
+            # a new list is created so that no room is left for values that may never be set
+            self.values = values = values + [UNSET] * (index + 1 - len(values))
+        values[index] = value
+
+    def get_header(self):
+        """
+        Gets the header of the file which this instance corresponds to.
+        """
+        return self.column_map.get('header')
+
+    def get_line(self):
+        """
+        Gets the line which this instance corresponds to.
+        """
+        index = self.column_map.attribute_indexes.get('line')
+        if index is not None and index < len(self.values) and self.values[index] is not UNSET:
+            return self.values[index]
+        return self.column_map.get('line', self.lineno)
+
+    def get_lineno(self):
+        """
+        Gets the line number which this instance corresponds to.
+        """
+        return self.lineno
+
+    def get_filename(self):
+        """
+        Gets the name of the file which this instance corresponds to.
+        """
+        return self.column_map.get('filename')
+
+    def get_where(self):
+        """
+        Gets the dictionary containing the filename and lineno of this instance.
+        """
+        return {'filename': self.column_map.get('filename'), 'lineno': self.lineno}
+
+    def __str__(self):
+        return '{}\n'.format('\t'.join([self.get(column) for column in self.get('schema').get('columns')]))
@@ -0,0 +1,95 @@
+"""
+AIDA class for the machine-readable log of the events recorded by aida.Logger.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+import atexit
+import gzip
+import json
+
+class EventLog:
+    """
+    The append-only, gzip-compressed file containing one JSON record per line for each event
+    written to the log by aida.Logger.
+
+    A record is the list [event_code, classname, args, where] where args is the list of the
+    string values of the arguments used for formatting the message of the event, and where is
+    either None or the dictionary containing the string values of 'filename' and 'lineno'.
+
+    Each invocation appends a gzip member to the file; the file is closed at exit.
+    """
+
+    def __init__(self, filename):
+        """
+        Initializes this instance.
+
+        Arguments:
+            filename (str):
+                the name of the file to which the events are appended.
+        """
+        self.filename = filename
+        self.file = gzip.open(filename, 'at', encoding='utf-8')
+        atexit.register(self.close)
+
+    def write(self, event_code, classname, args, where):
+        """
+        Appends the record of the event to the file.
+        """
+        if where is not None:
+            where = {'filename': str(where['filename']), 'lineno': str(where['lineno'])}
+        self.file.write(json.dumps([event_code, classname, ['{}'.format(arg) for arg in args], where], separators=(',', ':')))
+        self.file.write('\n')
+
+    def close(self):
+        """
+        Closes the file.
+        """
+        if not self.file.closed:
+            self.file.close()
+
+def read_events(filename, event_codes=None):
+    """
+    Generator of the records (event_code, classname, args, where) in the event log, in the
+    order in which the events were recorded.
+
+    Arguments:
+        filename (str):
+            the name of the event log.
+        event_codes (set or None):
+            if provided, only the records of the events whose code is in event_codes are
+            generated.
+
+    A file whose last gzip member is incomplete, e.g. because the process writing it was
+    killed, is read up to the last complete record.
+    """
+    with gzip.open(filename, 'rt', encoding='utf-8') as file:
+        try:
+            for line in file:
+                if not line.endswith('\n'):
+                    break
+                if event_codes is not None:
+                    # the record starts with the JSON string of the event code
+                    event_code = line[2:line.index('"', 2)]
+                    if event_code not in event_codes:
+                        continue
+                event_code, classname, args, where = json.loads(line)
+                yield event_code, classname, args, where
+        except EOFError:
+            return
+
+def index_events(filename, event_codes=None):
+    """
+    Returns the dictionary mapping the event code to the list of the records
+    (event_code, classname, args, where) of the events having that code, in the order in which
+    they were recorded.
+
+    See read_events for the description of the arguments.
+    """
+    index = {}
+    for record in read_events(filename, event_codes=event_codes):
+        index.setdefault(record[0], []).append(record)
+    return index
@@ -8,17 +8,21 @@ __version__ = "0.0.0.1"
 __date__    = "2 January 2020"
 
 from aida.object import Object
-from aida.entry import Entry
+from aida.column_map import ColumnMap
+from aida.entry import Entry, CompactEntry
 from aida.file_header import FileHeader
 
 import re
 
+# the number of characters read ahead when streaming the file
+READ_AHEAD_SIZE = 1 << 20
+
 class FileHandler(Object):
     """
     File handler for reading tab-separated files.
    """
 
-    def __init__(self, logger, filename, header=None, encoding=None):
+    def __init__(self, logger, filename, header=None, encoding=None, compact=False, stream=False):
         """
         Initializes this instance.
         Arguments:
@@ -31,35 +35,88 @@ class FileHandler(Object):
                 otherwise the header will be read from the first line.
             encoding (str or None):
                 the encoding to be used for opening the file.
+            compact (bool):
+                if True, lines from the file are read into compact entries (aida.CompactEntry)
+                that share the column map of the file (aida.ColumnMap).
+            stream (bool):
+                if True, only the header is read when initializing this instance, and
+                the entries are read from the file each time this instance is iterated over.
         """
         super().__init__(logger)
+        self.column_map = None
+        self.compact = compact
         self.encoding = encoding
         self.filename = filename
         self.header = header
+        self.header_lineno = None
         self.logger = logger
-        # lines from the file are read into entries (aida.Entry)
-        self.entries = []
+        self.stream = stream
+        # lines from the file are read into entries (aida.Entry), unless the file is streamed
+        self.entries = None if stream else []
         self.load_file()
     
     def load_file(self):
         """
         Load the file.
+
+        If the file is streamed, only the header is read here, and the entries
+        are read when iterating over this instance.
+        """
+        if self.get('header') is None:
+            self.load_header()
+        if not self.get('stream'):
+            self.get('entries').extend(self.generate_entries())
+
+    def load_header(self):
+        """
+        Load the header from the first line of the file.
         """
         with open(self.get('filename'), encoding=self.get('encoding')) as file:
-            for lineno, line in enumerate(file, start=1):
-                if self.get('header') is None:
-                    self.header = FileHeader(self.get('logger'), line.rstrip())
-                else:
-                    where = {'filename': self.get('filename'), 'lineno': lineno}
-                    entry = Entry(self.get('logger'), self.get('header').get('columns'),
-                                   line.rstrip('\r\n').split('\t', len(self.get('header').get('columns'))-1), where)
-                    entry.set('where', where)
-                    entry.set('header', self.get('header'))
-                    entry.set('line', line)
-                    self.get('entries').append(entry)
+            line = file.readline()
+            if line:
+                self.header = FileHeader(self.get('logger'), line.rstrip())
+                self.header_lineno = 1
+
+    def generate_entries(self):
+        """
+        Generates entries from the lines of the file.
+
+        The lines are read ahead in batches of about READ_AHEAD_SIZE characters.
+        """
+        if self.get('header') is None: return
+        with open(self.get('filename'), encoding=self.get('encoding')) as file:
+            lineno = 0
+            if self.get('header_lineno') is not None:
+                file.readline()
+                lineno = self.get('header_lineno')
+            while True:
+                lines = file.readlines(READ_AHEAD_SIZE)
+                if not lines: break
+                for line in lines:
+                    lineno += 1
+                    yield self.create_entry(lineno, line)
+
+    def create_entry(self, lineno, line):
+        """
+        Creates the entry corresponding to the line at the line number provided.
+        """
+        if self.get('compact'):
+            if self.get('column_map') is None:
+                self.column_map = ColumnMap(self.get('logger'), self.get('filename'), self.get('header'), encoding=self.get('encoding'))
+            return CompactEntry(self.get('logger'), self.get('column_map'),
+                           line.rstrip('\r\n').split('\t', len(self.get('header').get('columns'))-1), lineno)
+        where = {'filename': self.get('filename'), 'lineno': lineno}
+        entry = Entry(self.get('logger'), self.get('header').get('columns'),
+                       line.rstrip('\r\n').split('\t', len(self.get('header').get('columns'))-1), where)
+        entry.set('where', where)
+        entry.set('header', self.get('header'))
+        entry.set('line', line)
+        return entry
     
     def __iter__(self):
         """
         Returns iterator over entries.
         """
+        if self.get('stream'):
+            return self.generate_entries()
         return iter(self.get('entries'))
\ No newline at end of file
@@ -101,8 +101,7 @@ class FrameMetricScorer(Scorer):
                 'object': 'filler_cluster_id'
                 }
             cluster_id = edge.get(cluster_keys.get(cluster_type))
-            cluster = self.get('cluster', system_or_gold, document_id, cluster_id)
-            return len(cluster.get('mentions'))
+            return self.get('cluster_features').get('number_of_mentions', system_or_gold, document_id, cluster_id)
         sim = self.get('Sim', document_id, gold_edge, system_edge, cluster_type)
         precision = sim/get_number_of_mentions(document_id, cluster_type, 'system', system_edge)
         recall = sim/get_number_of_mentions(document_id, cluster_type, 'gold', gold_edge)
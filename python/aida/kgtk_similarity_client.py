@@ -0,0 +1,235 @@
+"""
+AIDA class for the client of the KGTK similarity service.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida.object import Object
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+import json
+import pandas as pd
+import requests
+import threading
+
+# the number of qnode pairs sent to the batch API in a single request
+BATCH_SIZE = 25
+
+# the seconds to wait before the first retry of a failed request; the wait doubles with
+# each retry until it reaches MAX_BACKOFF
+INITIAL_BACKOFF = 1
+MAX_BACKOFF = 60
+
+# the number of times a request is sent before giving up
+MAX_ATTEMPTS = 10
+
+# the HTTP status codes of the responses considered to be transient failures
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class KGTKSimilarityClient(Object):
+    """
+    The client of the KGTK similarity service.
+
+    The requests are sent by a pool of threads using a single session whose connections are
+    reused. A request that fails, either because of an exception or because of a transient
+    HTTP status, is retried after waiting for a time that doubles with each retry, up to
+    MAX_BACKOFF seconds. A request that fails max_attempts times is given up; if the
+    similarities it was sent for are then asked for, the requests not yet sent are cancelled
+    and a critical event is recorded, so that no similarity is ever silently missing.
+
+    A pair of qnodes whose similarity was requested is not requested again until its
+    similarity is returned; this allows requesting ahead the similarities that might be needed.
+    """
+
+    def __init__(self, logger, url, similarity_types, combine, max_requests=4, max_attempts=MAX_ATTEMPTS):
+        """
+        Initializes this instance.
+
+        Arguments:
+            logger (aida.Logger):
+                the aida.Logger object
+            url (str):
+                the URL of the KGTK similarity service.
+            similarity_types (list of str):
+                the similarity types to be requested.
+            combine (function):
+                the function used to combine the similarities of different types.
+            max_requests (int):
+                the maximum number of concurrent requests.
+            max_attempts (int):
+                the number of times a request is sent before giving up.
+        """
+        super().__init__(logger)
+        self.url = url
+        self.similarity_types = similarity_types
+        self.combine = combine
+        self.max_requests = max_requests
+        self.max_attempts = max_attempts
+        self.start()
+
+    def start(self):
+        """
+        Creates the session, the pool of threads sending the requests, and the record of the
+        requests in flight.
+
+        A process forked from the one using this instance does not inherit its threads, and
+        must therefore call this method before sending any request.
+        """
+        max_requests = self.get('max_requests')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_requests)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_requests)
+        self.in_flight = {}
+        self.in_flight_lock = threading.Lock()
+        # set when the requests are cancelled, so that the requests being sent stop retrying
+        self.cancelled = threading.Event()
+
+    def request(self, method, **kwargs):
+        """
+        Sends the request using the session, retrying it until it succeeds, and returns the
+        response; returns None if the request failed max_attempts times, or if the requests
+        were cancelled while it was being retried.
+        """
+        backoff = INITIAL_BACKOFF
+        for attempt in range(1, self.get('max_attempts') + 1):
+            try:
+                response = self.get('session').request(method, self.get('url'), **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                exception = 'HTTP status code {}'.format(response.status_code)
+            except requests.exceptions.RequestException as e:
+                exception = e
+            if attempt == self.get('max_attempts'):
+                break
+            self.record_event('KGTK_REQUEST_RETRY', exception, backoff)
+            if self.get('cancelled').wait(backoff):
+                return None
+            backoff = min(2 * backoff, MAX_BACKOFF)
+        self.record_event('KGTK_REQUEST_FAILED', attempt, exception)
+        return None
+
+    def submit(self, qnode_pair, function, *args):
+        """
+        Returns the future of the request of the similarity of the qnode pair, if any;
+        otherwise submits function(*args) to the pool and returns its future.
+        """
+        with self.get('in_flight_lock'):
+            future = self.get('in_flight').get(qnode_pair)
+            if future is None:
+                future = self.get('executor').submit(function, *args)
+                self.get('in_flight')[qnode_pair] = future
+            return future
+
+    def get_result(self, qnode_pair, future):
+        """
+        Waits for the future of the request of the similarity of the qnode pair, and returns
+        its result.
+        """
+        result = future.result()
+        with self.get('in_flight_lock'):
+            if self.get('in_flight').get(qnode_pair) is future:
+                del self.get('in_flight')[qnode_pair]
+        if result is None:
+            self.give_up('KGTK_SIMILARITY_UNAVAILABLE', *qnode_pair)
+        return result
+
+    def give_up(self, event_code, *args):
+        """
+        Cancels the requests not yet sent, and records the critical event whose code is event_code.
+        """
+        self.get('cancelled').set()
+        self.get('executor').shutdown(wait=False, cancel_futures=True)
+        self.record_event(event_code, *args)
+
+    def request_ahead(self, qnode_pairs):
+        """
+        Submits the requests of the similarities of the qnode pairs, using one request per
+        similarity type, without waiting for them.
+        """
+        for q1, q2 in qnode_pairs:
+            self.submit((q1, q2), self.request_similarity, q1, q2)
+
+    def get_similarity(self, q1, q2):
+        """
+        Returns the similarity of the qnodes using one request per similarity type.
+        """
+        return self.get('result', (q1, q2), self.submit((q1, q2), self.request_similarity, q1, q2))
+
+    def get_similarities(self, qnode_pairs):
+        """
+        Returns the dictionary mapping each pair (q1, q2) in qnode_pairs to its similarity,
+        requesting the similarities of the pairs concurrently.
+        """
+        futures = {self.submit((q1, q2), self.request_similarity, q1, q2):(q1, q2) for q1, q2 in sorted(qnode_pairs)}
+        similarities = {}
+        for future in tqdm(as_completed(futures), total=len(futures), desc='calling kgtk-similarity api for pairs'):
+            similarities[futures[future]] = self.get('result', futures[future], future)
+        return similarities
+
+    def request_similarity(self, q1, q2):
+        similarity = []
+        for similarity_type in self.get('similarity_types'):
+            response = self.request('GET', params={'q1': q1, 'q2': q2, 'similarity_type': similarity_type})
+            if response is None:
+                return None
+            json_struct = json.loads(response.text)
+            if 'error' not in json_struct:
+                similarity.append(1.0 if json_struct.get('similarity') > 1.0 else json_struct.get('similarity'))
+        return self.get('combine')(similarity) if len(similarity) else 0.0
+
+    def get_batched_similarities(self, qnode_pairs):
+        """
+        Returns the dictionary mapping the pair (q1, q2) to its similarity, for the pairs
+        returned by the batch API when sent the sorted qnode pairs in batches of BATCH_SIZE.
+        The batches are sent concurrently.
+        """
+        qnode_pairs = sorted(qnode_pairs)
+        futures = []
+        for batch_num, start in enumerate(range(0, len(qnode_pairs), BATCH_SIZE)):
+            futures.append(self.get('executor').submit(self.request_similarities, batch_num, qnode_pairs[start:start+BATCH_SIZE]))
+        similarities = {}
+        for future in tqdm(as_completed(futures), total=len(futures), desc='calling kgtk-similarity batch api'):
+            batch_similarities = future.result()
+            if batch_similarities is None:
+                self.give_up('KGTK_BATCH_SIMILARITIES_UNAVAILABLE', futures.index(future))
+            similarities.update(batch_similarities)
+        return similarities
+
+    def request_similarities(self, batch_num, qnode_pairs):
+        file_contents = 'q1\tq2\n' + ''.join('{}\t{}\n'.format(q1, q2) for q1, q2 in qnode_pairs)
+        files = {
+            'file': ('kgtk_cache_{}.txt'.format(batch_num), file_contents.encode('utf-8'), 'application/octet-stream')
+        }
+        response = self.request('POST', files=files, params={'similarity_types': ','.join(sorted(self.get('similarity_types')))})
+        if response is None:
+            return None
+        # the response is read through the tab-separated representation of its dataframe
+        lines = pd.DataFrame(json.loads(response.json())).to_csv(index=False, sep='\t').splitlines()
+        columns = lines[0].split('\t')
+        similarities = {}
+        for line in lines[1:]:
+            if line == '': continue
+            entry = dict(zip(columns, line.split('\t', len(columns)-1)))
+            similarity = []
+            for similarity_type in self.get('similarity_types'):
+                similarity_value = entry.get(similarity_type)
+                similarity_value = 0.0 if similarity_value == '' else similarity_value
+                similarity.append(float(similarity_value))
+            similarities[(entry.get('q1'), entry.get('q2'))] = self.get('combine')(similarity) if len(similarity) else 0
+        return similarities
+
+    def close(self):
+        """
+        Cancels the requests not yet sent, stops retrying those being sent and waits for
+        them, and releases the threads and the connections.
+        """
+        self.get('cancelled').set()
+        self.get('executor').shutdown(cancel_futures=True)
+        self.get('session').close()
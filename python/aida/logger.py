@@ -6,11 +6,48 @@ __status__  = "production"
 __version__ = "0.0.0.1"
 __date__    = "24 December 2019"
 
+from aida.event_log import EventLog
+
+import hashlib
 import logging
 import os
 import sys
 import traceback
 
+# the number of log records written to the log file between two flushes;
+# a record of level ERROR or above is flushed right away
+LOG_BUFFER_CAPACITY = 1000
+
+# the logging levels of the types of events that are only written to the log
+# file, and are therefore dropped when their level is below the debug level
+FILTERABLE_EVENT_LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    }
+
+class BufferedFileHandler(logging.FileHandler):
+    """
+    The logging.FileHandler which flushes the log file after every LOG_BUFFER_CAPACITY records,
+    or after a record of level ERROR or above, instead of after every record.
+    """
+
+    def __init__(self, filename, encoding=None):
+        super().__init__(filename, encoding=encoding)
+        self.num_unflushed = 0
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            self.num_unflushed += 1
+            if self.num_unflushed >= LOG_BUFFER_CAPACITY or record.levelno >= logging.ERROR:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self.num_unflushed = 0
+
 class Logger:
     """
     The logger for AIDA related scripts.
@@ -25,7 +62,7 @@ class Logger:
     num_errors = 0
     num_warnings = 0
     
-    def __init__(self, log_filename, event_specs_filename, argv, debug_level=logging.DEBUG):
+    def __init__(self, log_filename, event_specs_filename, argv, debug_level=logging.DEBUG, events_filename=None):
         """
         Initialize the logger object.
         
@@ -49,8 +86,13 @@ class Logger:
                     INFO = 20
                     DEBUG = 10
                     NOTSET = 0                
+            events_filename (str, OPTIONAL):
+                Name of the file to which the events written to the log file are also
+                written as machine-readable records (see aida.EventLog).
         """
-        self.recorded = {}
+        self.recorded = set()
+        self.captured_events = None
+        self.deferred_events = None
         self.log_filename = log_filename
         self.event_specs_filename = event_specs_filename
         self.path_name = os.getcwd()
@@ -58,6 +100,7 @@ class Logger:
         self.arguments = " ".join(argv[1:])
         self.script_codename = self.file_name
         self.debug_level = debug_level
+        self.event_log = EventLog(events_filename) if events_filename is not None else None
         self.logger_object = logging.getLogger(self.file_name)
         self.configure_logger()
         self.record_program_invokation()
@@ -67,13 +110,65 @@ class Logger:
         """
         Set the output file of the logger, the debug level, format of log output, and
         format of date and time in log output.
+
+        The log file is flushed in batches (see BufferedFileHandler), before the process forks,
+        and at exit. As with logging.basicConfig, nothing is done if the root logger has
+        already been configured.
         """
-        logging.basicConfig(filename=self.log_filename, 
-                            encoding='utf-8',
-                            level=self.debug_level,
-                            format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                            datefmt='%m/%d/%Y %I:%M:%S %p')
-    
+        root_logger = logging.getLogger()
+        if root_logger.handlers:
+            return
+        handler = BufferedFileHandler(self.log_filename, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                                               datefmt='%m/%d/%Y %I:%M:%S %p'))
+        root_logger.addHandler(handler)
+        root_logger.setLevel(self.debug_level)
+        # flush before forking so that a child process does not inherit the unflushed records
+        os.register_at_fork(before=handler.flush)
+
+    def capture_events(self):
+        """
+        Start capturing the events, in addition to recording them, so that they can be
+        recorded again, using record_deferred_events, e.g. when the results of the
+        computation during which they were recorded are read from a cache.
+        """
+        self.captured_events = []
+
+    def get_captured_events(self):
+        """
+        Returns the list of events captured since capture_events was called, and stops capturing.
+        """
+        captured_events = self.captured_events
+        self.captured_events = None
+        return captured_events
+
+    def defer_events(self):
+        """
+        Start deferring events instead of writing them to the log.
+
+        This is used by worker processes: the deferred events are retrieved using
+        get_deferred_events, passed back to the parent process, and recorded there,
+        using record_deferred_events, in a deterministic order.
+
+        A deferred CRITICAL event (or an unknown event) still stops the worker.
+        """
+        self.deferred_events = []
+
+    def get_deferred_events(self):
+        """
+        Returns the list of events deferred since the last call, and clears it.
+        """
+        deferred_events = self.deferred_events
+        self.deferred_events = []
+        return deferred_events
+
+    def record_deferred_events(self, deferred_events):
+        """
+        Record the events, as returned by get_deferred_events, in the order of their occurrence.
+        """
+        for event_code, args, classname in deferred_events:
+            self.record_event(event_code, *args, classname=classname)
+
     def get_logger(self):
         """
         Returns the logger object which can be used for recording events.
@@ -132,6 +227,18 @@ class Logger:
         MESSAGE is the message written to the log file. It has zero or more arguments to be filled 
         by ARG1, ARG2, ...
         """
+        if self.captured_events is not None:
+            self.captured_events.append((event_code, args, classname))
+        event_object = self.event_specs.get(event_code)
+        if event_object is not None:
+            event_level = FILTERABLE_EVENT_LEVELS.get(event_object['type'].upper())
+            if event_level is not None and not self.logger_object.isEnabledFor(event_level):
+                return
+        if self.deferred_events is not None:
+            self.deferred_events.append((event_code, args, classname))
+            if event_code not in self.event_specs or self.event_specs[event_code]['type'].upper() not in ['DEBUG', 'ERROR', 'INFO', 'WARNING']:
+                sys.exit('Deferred event {} stopped the worker'.format(event_code))
+            return
         argslst = []
         where = None
         if len(args):
@@ -144,9 +251,12 @@ class Logger:
             event_message = event_object['message'].format(*argslst)
             classname = 'NO_CLASS_NAME' if classname is None else classname
             event_message = '{classname} - {code} - {message}'.format(classname=classname, code=event_code, message=event_message)
-            if event_message in self.recorded:
+            recorded_key = hashlib.blake2b(event_message.encode('utf-8'), digest_size=16).digest()
+            if recorded_key in self.recorded:
                 return
-            self.recorded[event_message] = 1
+            self.recorded.add(recorded_key)
+            if self.event_log is not None:
+                self.event_log.write(event_code, classname, argslst, where)
             if where is not None:
                 event_message += " at " + where['filename'] + ":" + str(where['lineno'])
             if event_type.upper() == "CRITICAL":
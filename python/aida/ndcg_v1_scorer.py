@@ -31,19 +31,124 @@ def normalize_claim_relation(relation):
         }
     return apply_patch.get(relation)
 
+def normalize_field_value(value):
+    mapping = {
+        'EpistemicTrueCertain': 'True',
+        'EpistemicTrueUncertain': 'True',
+        'EpistemicFalseCertain': 'False',
+        'EpistemicFalseUncertain': 'False',
+        'EpistemicUnknown': 'Unknown'
+        }
+    return mapping[value] if value in mapping else value
+
+def parse_date_range(date_range):
+    """
+    Parses the date range of the form (start_after,start_before)-(end_after,end_before), and
+    returns the list of the four date strings.
+    """
+    start, end = [e.replace('(','').replace(')','') for e in date_range.split(')-(')]
+    start_after, start_before = start.split(',')
+    end_after, end_before = end.split(',')
+    return [start_after, start_before, end_after, end_before]
+
 class OuterClaim(Object):
     def __init__(self, logger, **kwargs):
         super().__init__(logger)
         self.is_query_claim_frame = False
+        self.claim_features = None
         for key in kwargs:
             self.set(key, kwargs[key])
-        self.data = {}
-        self.load()
+        self.key = (self.get('path'), self.get('claim_id'), self.get('is_query_claim_frame'))
+        # the data read from the file, and the fields extracted from the data, are shared
+        # with the other instances of the same claim when the claim features cache is provided
+        claim_features = self.get('claim_features')
+        features = {} if claim_features is None else claim_features.setdefault(self.get('key'), {})
+        if 'data' not in features:
+            self.data = {}
+            self.load()
+            features['data'] = self.get('data')
+        self.data = features.get('data')
+        self.fields = features.setdefault('fields', {})
 
     def add(self, component_type, idnum, fieldname, value, correctness):
         self.get('data').setdefault(component_type, {}).setdefault(idnum, {}).setdefault(fieldname, []).append({'value': value,
                                                                                                         'correctness': correctness})
 
+    def get_field(self, fieldspec):
+        """
+        Returns the dictionary containing the following for the field specified by fieldspec:
+            values (frozenset):
+                the normalized values of the field,
+            correct_values (frozenset):
+                the normalized values of the field that were assessed as correct,
+            events (list):
+                the arguments of the CLAIM_FIELD_CORRECTNESS event for each component of the field,
+            dates (dict):
+                the datetime parsed from each date string of the field that was compared (see get_date).
+
+        The field is extracted from the data when it is asked for the first time.
+        """
+        fields = self.get('fields')
+        key = (fieldspec.get('fieldname'), fieldspec.get('value_fieldnames'), fieldspec.get('overall_assessment_fieldname'), fieldspec.get('max_num_of_values'))
+        if key not in fields:
+            fields[key] = self.get('extracted_field', fieldspec)
+        return fields[key]
+
+    def get_extracted_field(self, fieldspec):
+        def truncate(values):
+            retVals = []
+            max_num_of_values = fieldspec.get('max_num_of_values')
+            for value in sorted(values):
+                retVals.append(value)
+                max_num_of_values -= 1
+                if not max_num_of_values: break
+            return frozenset(retVals)
+        values = []
+        correct_values = []
+        events = []
+        data = self.get('data').get(fieldspec.get('fieldname'))
+        if data:
+            fieldname, sub_fieldname = fieldspec.get('value_fieldnames').split(':')
+            for component_id, entry in data.items():
+                field_correctness = self.get('field_correctness', fieldspec, component_id)
+                fieldvalue = normalize_field_value(entry.get(fieldname)[0].get(sub_fieldname))
+                events.append((self.get('claim_id'), fieldspec.get('fieldname'), fieldvalue, field_correctness))
+                values.append(fieldvalue)
+                if field_correctness:
+                    correct_values.append(fieldvalue)
+        field = {'values': truncate(values),
+                 'correct_values': truncate(correct_values),
+                 'events': events,
+                 'dates': {}}
+        return field
+
+    def get_date(self, fieldspec, date_string):
+        """
+        Returns the datetime parsed from date_string, one of the dates of the field specified by fieldspec.
+
+        The date is parsed when it is compared for the first time, so that a malformed date
+        of a claim that is never compared does not abort scoring.
+        """
+        dates = self.get('field', fieldspec).get('dates')
+        if date_string not in dates:
+            dates[date_string] = datetime.fromisoformat(date_string)
+        return dates[date_string]
+
+    def get_field_correctness(self, fieldspec, component_id='1'):
+        if self.get('is_query_claim_frame'):
+            return True
+        correctness_code = {
+            'Correct': True,
+            'Incorrect': False,
+            'Inexact': True,
+            'Wrong': False,
+            'N/A': False,
+            }
+        correctness = self.get('data').get(fieldspec.get('fieldname')).get(component_id).get(fieldspec.get('overall_assessment_fieldname'))[0].get('correctness')
+        if correctness not in correctness_code:
+            self.record_event('DEFAULT_CRITICAL_ERROR', 'Unexpected value \'{}\' for correctness'.format(correctness))
+        return correctness_code.get(correctness)
+
     def load(self):
         filename = os.path.join(self.get('path'), '{}-outer-claim.tab'.format(self.get('claim_id')))
         for entry in FileHandler(self.get('logger'), filename):
@@ -69,6 +174,8 @@ class NDCGScorerV1(Scorer):
                       {'name': 'ndcg',                   'header': 'NDCG',               'format': '6.4f', 'justify': 'R', 'mean_format': '6.4f'}]
 
     def __init__(self, logger, **kwargs):
+        self.recorded_claim_features = set()
+        self.claim_relation_correctness_scales = {}
         super().__init__(logger, **kwargs)
 
     def get_assessed_claim(self, claim):
@@ -83,18 +190,19 @@ class NDCGScorerV1(Scorer):
                                  run_claim_path=claim.get('path'),
                                  run_claim_id=claim.get('claim_id'),
                                  run_claim_relation=claim.get('claim_relation'),
-                                 run_claim_rank=claim.get('rank'))
+                                 run_claim_rank=claim.get('rank'),
+                                 claim_features=self.get('claim_features'))
         return outer_claim
 
     def get_assessed_claim_relation(self, query, claim):
-        claim_relation = None
-        for entry in self.get('assessments').get('cross_claim_relations'):
-            system_claim_id = entry.get('system_claim_id')
-            query_claim_id = entry.get('query_claim_id')
-            claim_relation = normalize_claim_relation(entry.get('relation'))
-            if query.get('query_id') == query_claim_id and claim.get('claim_id') == system_claim_id:
-                return claim_relation
-        return claim_relation
+        assessments = self.get('assessments')
+        entry = assessments.get('cross_claim_relation', query.get('query_id'), claim.get('claim_id'))
+        if entry is None:
+            # if the relation was not assessed, the relation in the last entry is used
+            # (as was the case when the list of cross claim relations was scanned)
+            entries = assessments.get('cross_claim_relations').get('entries')
+            entry = entries[-1] if len(entries) else None
+        return normalize_claim_relation(entry.get('relation')) if entry is not None else None
 
     def get_claim_relation_correctness(self, ranked_list_claim_relation, claim):
         """
@@ -131,6 +239,13 @@ class NDCGScorerV1(Scorer):
                 return 0.5
         return 0
 
+    def get_claim_features(self):
+        """
+        Returns the claim features cache, keyed by claim, which is kept with the assessments
+        so that it is shared by all the scorers, and all the runs, using the same assessments.
+        """
+        return self.get('assessments').get('claim_features')
+
     def get_claim_relations(self, score, scores):
         field_name = 'claim_relation'
         values = [score.get(field_name)]
@@ -161,48 +276,26 @@ class NDCGScorerV1(Scorer):
         return values
 
     def get_field_correctness(self, fieldspec, claim, component_id='1'):
-        if claim.get('is_query_claim_frame'):
-            return True
-        correctness_code = {
-            'Correct': True,
-            'Incorrect': False,
-            'Inexact': True,
-            'Wrong': False,
-            'N/A': False,
-            }
-        correctness = claim.get('data').get(fieldspec.get('fieldname')).get(component_id).get(fieldspec.get('overall_assessment_fieldname'))[0].get('correctness')
-        if correctness not in correctness_code:
-            self.record_event('DEFAULT_CRITICAL_ERROR', 'Unexpected value \'{}\' for correctness'.format(correctness))
-        return correctness_code.get(correctness)
+        return claim.get('field_correctness', fieldspec, component_id)
 
     def get_field_values(self, fieldspec, claim, correctness_requirement=False):
-        def normalize(value):
-            mapping = {
-                'EpistemicTrueCertain': 'True',
-                'EpistemicTrueUncertain': 'True',
-                'EpistemicFalseCertain': 'False',
-                'EpistemicFalseUncertain': 'False',
-                'EpistemicUnknown': 'Unknown'
-                }
-            return mapping[value] if value in mapping else value
-        values = []
-        if claim is not None:
-            data = claim.get('data').get(fieldspec.get('fieldname'))
-            if data:
-                fieldname, sub_fieldname = fieldspec.get('value_fieldnames').split(':')
-                for component_id, entry in data.items():
-                    field_correctness = self.get('field_correctness', fieldspec, claim, component_id)
-                    fieldvalue = normalize(entry.get(fieldname)[0].get(sub_fieldname))
-                    self.record_event('CLAIM_FIELD_CORRECTNESS', claim.get('claim_id'), fieldspec.get('fieldname'), fieldvalue, field_correctness)
-                    if (not correctness_requirement) or field_correctness:
-                        values.append(fieldvalue)
-        retVals = set()
-        max_num_of_values = fieldspec.get('max_num_of_values')
-        for value in sorted(values):
-            retVals.add(value)
-            max_num_of_values -= 1
-            if not max_num_of_values: break
-        return retVals
+        """
+        Returns the frozenset of normalized values of the field of the claim.
+
+        The values are extracted once per claim (see OuterClaim.get_field). The
+        CLAIM_FIELD_CORRECTNESS events recorded while extracting them are recorded
+        when the values are used by this scorer for the first time.
+        """
+        if claim is None:
+            return frozenset()
+        field = claim.get('field', fieldspec)
+        key = (claim.get('key'), fieldspec.get('fieldname'))
+        recorded_claim_features = self.get('recorded_claim_features')
+        if key not in recorded_claim_features:
+            for event in field.get('events'):
+                self.record_event('CLAIM_FIELD_CORRECTNESS', *event)
+            recorded_claim_features.add(key)
+        return field.get('correct_values') if correctness_requirement else field.get('values')
 
     def get_gain(self, query, claim_relation, ranked_claims, rank):
         query_claim_frame = query.get('query_claim_frame')
@@ -219,8 +312,13 @@ class NDCGScorerV1(Scorer):
     def get_pairwise_novelty_score(self, query, claim_relation, the_claim, previous_claim):
         pairwise_novelty_scores = self.get('pairwise_novelty_scores')
         lookup_key = '-'.join([the_claim.get('claim_id'), previous_claim.get('claim_id') if previous_claim else 'None'])
-        claim_relation_correctness_scale = self.get('claim_relation_correctness', claim_relation, the_claim) if query.get('condition') == 'Condition5' else 1
-        self.record_event('CLAIM_RELATION_CORRECTNESS', query.get('query_id'), the_claim.get('claim_id'), claim_relation, claim_relation_correctness_scale)
+        claim_relation_correctness_scales = self.get('claim_relation_correctness_scales')
+        scale_lookup_key = (query.get('query_id'), claim_relation, the_claim.get('claim_id'))
+        if scale_lookup_key not in claim_relation_correctness_scales:
+            claim_relation_correctness_scale = self.get('claim_relation_correctness', claim_relation, the_claim) if query.get('condition') == 'Condition5' else 1
+            self.record_event('CLAIM_RELATION_CORRECTNESS', query.get('query_id'), the_claim.get('claim_id'), claim_relation, claim_relation_correctness_scale)
+            claim_relation_correctness_scales[scale_lookup_key] = claim_relation_correctness_scale
+        claim_relation_correctness_scale = claim_relation_correctness_scales.get(scale_lookup_key)
         if claim_relation_correctness_scale == 0:
             return 0
         if lookup_key not in pairwise_novelty_scores:
@@ -244,7 +342,7 @@ class NDCGScorerV1(Scorer):
         if len(the_claim_field_values):
             weight = len(the_claim_field_values - previous_claim_field_values)
             if fieldspec.get('fieldname') == 'date':
-                weight = self.get('field_pairwise_novelty_weight_date', the_claim_field_values, previous_claim_field_values)
+                weight = self.get('field_pairwise_novelty_weight_date', fieldspec, the_claim, the_claim_field_values, previous_claim, previous_claim_field_values)
             if weight == 0 or fieldspec.get('max_num_of_values') > 1:
                 if fieldspec.get('fieldname') in dependents_stack:
                     return 0
@@ -259,7 +357,7 @@ class NDCGScorerV1(Scorer):
                         break
         return weight
 
-    def get_field_pairwise_novelty_weight_date(self, the_claim_field_values, previous_claim_field_values):
+    def get_field_pairwise_novelty_weight_date(self, fieldspec, the_claim, the_claim_field_values, previous_claim, previous_claim_field_values):
         def different(date_string_1, date_string_2):
             different = False
             if date_string_1 == '--' and date_string_2 == '--':
@@ -267,23 +365,18 @@ class NDCGScorerV1(Scorer):
             elif date_string_1 == '--' or date_string_2 == '--':
                 different = True
             else:
-                date1 = datetime.fromisoformat(date_string_1)
-                date2 = datetime.fromisoformat(date_string_2)
+                date1 = the_claim.get('date', fieldspec, date_string_1)
+                date2 = previous_claim.get('date', fieldspec, date_string_2)
                 delta = date1 - date2 if date1 > date2 else date2 - date1
                 if delta.days > 30:
                     different = True
             return different
-        def parse(date_range):
-            start, end = [e.replace('(','').replace(')','') for e in date_range.split(')-(')]
-            start_after, start_before = start.split(',')
-            end_after, end_before = end.split(',')
-            return [start_after, start_before, end_after, end_before]
         weight = len(the_claim_field_values)
         if len(previous_claim_field_values):
             if len(the_claim_field_values) != 1 and len(previous_claim_field_values) != 1:
                 self.record_event('DEFAULT_CRITIAL_ERROR', 'unexpected number of date field values')
-            the_claim_times = parse(list(the_claim_field_values)[0])
-            previous_claim_times = parse(list(previous_claim_field_values)[0])
+            the_claim_times = parse_date_range(list(the_claim_field_values)[0])
+            previous_claim_times = parse_date_range(list(previous_claim_field_values)[0])
             weight = 0
             for i in range(4):
                 if different(the_claim_times[i], previous_claim_times[i]):
@@ -345,7 +438,8 @@ class NDCGScorerV1(Scorer):
                                      run_claim_path=claim.get('path'),
                                      run_claim_id=claim.get('claim_id'),
                                      run_claim_relation=claim_relation,
-                                     run_claim_rank=rank)
+                                     run_claim_rank=rank,
+                                     claim_features=self.get('claim_features'))
             return outer_claim
         def on_same_topic(query_id_1, query_id_2):
             def get_topic_id(query_id):
@@ -359,12 +453,15 @@ class NDCGScorerV1(Scorer):
             'related': ['related'],
             'supporting': ['supporting'],
             }
+        query_cross_claim_relations = self.get('assessments').get('query_cross_claim_relations', query.get('query_id'))
         identical_claims = set()
-        for entry in self.get('assessments').get('cross_claim_relations'):
-            if entry.get('relation') == 'identical' and entry.get('query_claim_id') == query.get('query_id'):
+        for entry in query_cross_claim_relations:
+            if entry.get('relation') == 'identical':
                 identical_claims.add(entry.get('system_claim_id'))
         related_claim_ids = set()
-        for entry in self.get('assessments').get('cross_claim_relations'):
+        # relations of the claims of other queries are needed only if the ranked list is ontopic
+        cross_claim_relations = self.get('assessments').get('cross_claim_relations') if claim_relation == 'ontopic' else query_cross_claim_relations
+        for entry in cross_claim_relations:
             if entry.get('system_claim_id') in identical_claims: continue
             cross_claim_relation = normalize_claim_relation(entry.get('relation'))
             if cross_claim_relation in compatible_claim_relations.get(claim_relation):
@@ -384,19 +481,32 @@ class NDCGScorerV1(Scorer):
                     rank += 1
         ideal_claims_ranking = []
         sorted_claims_set = list(sorted(claims_set, key=lambda c: c.get('claim_id')))
+        # the gain each remaining claim would have if appended next to the ideal ranking is kept as the
+        # running minimum of its pairwise novelty scores against the query claim frame and the claims
+        # ranked so far, so that only the last ranked claim needs to be compared against; as in get_gain,
+        # the gain drops to zero, and the claim is compared no further, once any of the latter scores is zero
+        query_claim_frame = query.get('query_claim_frame')
+        gains = {}
+        exhausted = set()
+        for the_claim in sorted_claims_set:
+            gains[the_claim] = self.get('pairwise_novelty_score', query, claim_relation, the_claim, query_claim_frame)
         while(len(sorted_claims_set)):
             best_next_claim = None
             max_gain_of_next_claim = None
             for the_claim in sorted_claims_set:
-                test_ranked_list = list(ideal_claims_ranking[:])
-                test_ranked_list.append(the_claim)
-                rank = len(test_ranked_list) - 1
-                gain_of_the_claim = self.get('gain', query, claim_relation, test_ranked_list, rank)
+                gain_of_the_claim = 0 if the_claim in exhausted else gains[the_claim]
                 if max_gain_of_next_claim is None or gain_of_the_claim > max_gain_of_next_claim:
                     max_gain_of_next_claim = gain_of_the_claim
                     best_next_claim = the_claim
             ideal_claims_ranking.append(best_next_claim)
             sorted_claims_set.remove(best_next_claim)
+            for the_claim in sorted_claims_set:
+                if the_claim in exhausted: continue
+                pairwise_novelty_score = self.get('pairwise_novelty_score', query, claim_relation, the_claim, best_next_claim)
+                if pairwise_novelty_score == 0:
+                    exhausted.add(the_claim)
+                elif gains[the_claim] > pairwise_novelty_score:
+                    gains[the_claim] = pairwise_novelty_score
         return ideal_claims_ranking[0:self.get('pooling_depth', query, claim_relation)] if LIMITED_TO_POOLING_DEPTH else ideal_claims_ranking
 
     def get_ranked_claims_submitted(self, query, claim_relation, LIMITED_TO_POOLING_DEPTH=False):
@@ -623,7 +733,8 @@ class NDCGScorerV1(Scorer):
                                    path=path,
                                    query_id=query_id,
                                    query=query,
-                                   rank=-1000000)
+                                   rank=-1000000,
+                                   claim_features=self.get('claim_features'))
                 query.set('query_claim_frame', claim)
                 self.record_event('CLAIM_STRING', self.get('claim_to_string', query, claim))
 
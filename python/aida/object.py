@@ -9,13 +9,39 @@ __date__    = "2 January 2020"
 
 from inspect import currentframe, getouterframes
 
-class Object(object):
+class BaseObject(object):
     """
-    This class represents an AIDA object which is envisioned to be the parent of most of the AIDA related classes.
-    
-    At a high level this class is a wrapper around a single dictionary object which provides support for complex getters.
+    The base class of aida.Object, which has no per-instance dictionary of attributes.
+
+    A class that needs to keep its instances small (e.g. aida.CompactEntry) derives from this
+    class and declares its attributes using __slots__; every other class derives from aida.Object.
+
+    The names of the getter methods, and of the class attributes, are resolved once per class when the
+    class is defined (see resolve_getters), so that get does not need to look them up on every call.
     """
 
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Resolves the getters of every class derived from Object when the class is defined.
+        """
+        super().__init_subclass__(**kwargs)
+        cls.resolve_getters()
+
+    @classmethod
+    def resolve_getters(cls):
+        """
+        Resolves, for this class, the mapping from key to the name of the method get_{key},
+        and the set of names of the class attributes.
+        """
+        getter_method_names = {}
+        for name in dir(cls):
+            if name.startswith('get_') and callable(getattr(cls, name, None)):
+                getter_method_names[name[len('get_'):]] = name
+        cls.getter_method_names = getter_method_names
+        cls.class_attribute_names = frozenset(dir(cls))
+
     def __init__(self, logger):
         """
         Initializes this instance, and sets the logger for newly created instance.
@@ -38,13 +64,11 @@ class Object(object):
         key = args[0]
         if key is None:
             self.get('logger').record_event('KEY_IS_NONE', self.get('code_location'))
-        method = self.get_method("get_{}".format(key))
-        if method is not None:
+        method_name = self.getter_method_names.get(key)
+        if method_name is not None:
             args = args[1:]
-            return method(*args, **kwargs)
-        else:
-            value = getattr(self, key, None)
-            return value
+            return getattr(self, method_name)(*args, **kwargs)
+        return getattr(self, key, None)
 
     def get_method(self, method_name):
         """
@@ -89,4 +113,40 @@ class Object(object):
         """
         Sets the value of an attribute, of the current, whose name matches the value stored in key.
         """
-        setattr(self, key, value)
\ No newline at end of file
+        setattr(self, key, value)
+
+BaseObject.resolve_getters()
+
+class Object(BaseObject):
+    """
+    This class represents an AIDA object which is envisioned to be the parent of most of the AIDA related classes.
+    
+    At a high level this class is a wrapper around a single dictionary object which provides support for complex getters.
+    """
+
+    def get(self, *args, **kwargs):
+        """
+        Gets the value for the key using the given args.
+
+        If method get_{key} is defined for this object, call that method with
+        args as its arguments, and return what it returns, otherwise if there
+        is an attribute whose name matches the value stored in key then return
+        it. None is returned otherwise.
+        """
+        key = args[0]
+        if key is None:
+            self.get('logger').record_event('KEY_IS_NONE', self.get('code_location'))
+        method_name = self.getter_method_names.get(key)
+        if method_name is not None:
+            args = args[1:]
+            return getattr(self, method_name)(*args, **kwargs)
+        else:
+            # plain keys are looked up directly in the instance attributes, and only
+            # the names of class attributes need to go through getattr
+            attributes = self.__dict__
+            if key in attributes:
+                return attributes[key]
+            if isinstance(key, str) and key not in self.class_attribute_names:
+                return None
+            value = getattr(self, key, None)
+            return value
@@ -0,0 +1,167 @@
+"""
+AIDA PackedMentions class.
+
+This class supports the vectorized computation of intersection-over-union
+between the mentions of two clusters.
+"""
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida.object import Object
+from aida.utility import get_intersection_over_union
+
+import numpy as np
+
+# collars used by get_intersection_over_union_image and get_intersection_over_union_video
+IMAGE_COLLAR = 1
+VIDEO_COLLAR = 0.01
+
+class PackedMentions(Object):
+    """
+    The mentions of a cluster packed into arrays.
+
+    The spans are stored as a (number of mentions x 4) array with columns
+    start_x, start_y, end_x and end_y. The spans clipped to the document boundary,
+    as needed for image and video mentions, are computed lazily and only for the
+    mentions that are compared against another mention in the same document element.
+    """
+
+    def __init__(self, logger, mentions):
+        """
+        Initialize the PackedMentions object.
+
+        Arguments:
+            logger (aida.Logger):
+                the aida.Logger object
+            mentions (list):
+                the list of mention objects as stored in the cluster
+        """
+        super().__init__(logger)
+        self.mentions = list(mentions)
+        self.ids = [mention.get('ID') for mention in self.mentions]
+        self.document_element_keys = [(mention.get('document_id'), mention.get('document_element_id')) for mention in self.mentions]
+        self.kernels = [self.get('kernel_name', mention) for mention in self.mentions]
+        self.spans = np.array([[float(mention.get('span').get(k)) for k in ['start_x', 'start_y', 'end_x', 'end_y']] for mention in self.mentions], dtype=np.float64).reshape(-1, 4)
+        self.clipped_spans_cache = {}
+
+    def __len__(self):
+        return len(self.mentions)
+
+    def get_kernel_name(self, mention):
+        """
+        Returns the name of the kernel that get_intersection_over_union would
+        use when the mention is passed as its first argument.
+        """
+        modality = mention.get('modality')
+        if modality == 'text':
+            return 'text'
+        elif modality == 'image':
+            return 'image'
+        elif modality == 'video':
+            return 'image' if mention.get('keyframe_id') else 'video'
+        return None
+
+    def get_clipped_spans(self, kernel_name, indices):
+        """
+        Returns the spans, at the indices provided, expanded by the collar used
+        by the kernel and clipped to the boundary of the mention.
+        """
+        clipped_spans = self.get('clipped_spans_cache').setdefault(kernel_name, {})
+        for index in indices:
+            if index in clipped_spans: continue
+            mention = self.get('mentions')[index]
+            boundary = mention.get('boundary')
+            span = list(self.get('spans')[index])
+            dimensions = ['x', 'y'] if kernel_name == 'image' else ['x']
+            collar = IMAGE_COLLAR if kernel_name == 'image' else VIDEO_COLLAR
+            for d in dimensions:
+                start_index, end_index = (0, 2) if d == 'x' else (1, 3)
+                minimum, maximum = [float(boundary.get(k)) for k in ['start_{}'.format(d), 'end_{}'.format(d)]]
+                start = span[start_index] - collar
+                end = span[end_index] + collar
+                if start < minimum:
+                    start = minimum
+                if end > maximum:
+                    end = maximum
+                span[start_index] = start
+                span[end_index] = end
+            clipped_spans[index] = span
+        return np.array([clipped_spans[index] for index in indices], dtype=np.float64).reshape(-1, 4)
+
+def get_linear_overlap_matrix(start1, end1, start2, end2, text_modality=False):
+    """
+    Vectorized counterpart of aida.utility.get_linear_overlap.
+
+    The arguments are broadcast against each other.
+    """
+    overlaps = ((start2 <= start1) & (start1 <= end2)) | ((start2 <= end1) & (end1 <= end2)) | ((start1 <= start2) & (start2 <= end1)) | ((start1 <= end2) & (end2 <= end1))
+    overlap = np.minimum(end1, end2) - np.maximum(start1, start2)
+    if text_modality:
+        overlap = overlap + 1
+    return np.where(overlaps, overlap, 0.0)
+
+def get_intersection_matrix(spans1, spans2):
+    """
+    Vectorized counterpart of aida.utility.get_intersection.
+
+    The spans are broadcast against each other.
+    """
+    dx = get_linear_overlap_matrix(spans1[..., 0], spans1[..., 2], spans2[..., 0], spans2[..., 2])
+    dy = get_linear_overlap_matrix(spans1[..., 1], spans1[..., 3], spans2[..., 1], spans2[..., 3])
+    return np.where((dx != 0) & (dy != 0), dx * dy, np.where(dx != 0, dx, dy))
+
+def get_intersection_over_union_block(kernel_name, spans1, spans2):
+    """
+    Returns the (len(spans1) x len(spans2)) matrix of intersection over union
+    computed using the named kernel, i.e. 'text', 'image' or 'video'.
+    """
+    if kernel_name == 'text':
+        start1, end1 = spans1[:, 0][:, None], spans1[:, 2][:, None]
+        start2, end2 = spans2[:, 0][None, :], spans2[:, 2][None, :]
+        intersection = get_linear_overlap_matrix(start1, end1, start2, end2, text_modality=True)
+        union = ((end1 - start1 + 1) + (end2 - start2 + 1)) - intersection
+    else:
+        intersection = get_intersection_matrix(spans1[:, None, :], spans2[None, :, :])
+        union = (get_intersection_matrix(spans1, spans1)[:, None] + get_intersection_matrix(spans2, spans2)[None, :]) - intersection
+    intersection_over_union = np.zeros(intersection.shape, dtype=np.float64)
+    np.divide(intersection, union, out=intersection_over_union, where=(union != 0))
+    return intersection_over_union
+
+def get_intersection_over_union_matrix(packed_mentions1, packed_mentions2):
+    """
+    Vectorized counterpart of aida.utility.get_intersection_over_union.
+
+    Returns the (len(packed_mentions1) x len(packed_mentions2)) matrix whose cell [i, j]
+    contains the value get_intersection_over_union(mention_i, mention_j) would return
+    for the i-th mention in packed_mentions1 and the j-th mention in packed_mentions2.
+
+    Only the mentions sharing the document element are compared, and the kernel
+    is selected by the mention in packed_mentions1 just as is done by the scalar
+    counterpart.
+    """
+    matrix = np.zeros((len(packed_mentions1), len(packed_mentions2)), dtype=np.float64)
+    columns_by_key = {}
+    for index, key in enumerate(packed_mentions2.get('document_element_keys')):
+        columns_by_key.setdefault(key, []).append(index)
+    blocks = {}
+    for index, key in enumerate(packed_mentions1.get('document_element_keys')):
+        if key not in columns_by_key: continue
+        blocks.setdefault((key, packed_mentions1.get('kernels')[index]), []).append(index)
+    for (key, kernel_name), rows in blocks.items():
+        columns = columns_by_key[key]
+        if kernel_name is None:
+            # let the scalar counterpart handle (and report) the unexpected modality
+            for row in rows:
+                for column in columns:
+                    matrix[row, column] = get_intersection_over_union(packed_mentions1.get('mentions')[row], packed_mentions2.get('mentions')[column])
+            continue
+        if kernel_name == 'text':
+            spans1 = packed_mentions1.get('spans')[rows]
+            spans2 = packed_mentions2.get('spans')[columns]
+        else:
+            spans1 = packed_mentions1.get('clipped_spans', kernel_name, rows)
+            spans2 = packed_mentions2.get('clipped_spans', kernel_name, columns)
+        matrix[np.ix_(rows, columns)] = get_intersection_over_union_block(kernel_name, spans1, spans2)
+    return matrix
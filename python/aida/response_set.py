@@ -16,8 +16,17 @@ from aida.generator import Generator
 from aida.validator import Validator
 from aida.normalizer import Normalizer
 from aida.event_or_relation_frame import EventOrRelationFrame
+from aida.response_set_cache import ResponseSetCache
+from aida.shared_objects import SharedObjects
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
+import multiprocessing
 import os
+import traceback
+
+# the response set loaded in a worker process, and the objects it shares with the parent process; set by init_worker
+WORKER_RESPONSE_SET = None
+WORKER_SHARED_OBJECTS = None
 
 attributes = {
     'argument_assertion_confidence': {
@@ -973,19 +982,53 @@ def identify_file_schema(fh, task):
             if found: return schema
     return None
 
+def get_shared_objects(responses):
+    """
+    Returns the aida.SharedObjects containing the objects that the responses share with
+    other response sets or with the parent process, i.e. the response set itself, the logger,
+    the document mappings, the document boundaries, the queries, and the schemas.
+    """
+    objects = {
+        'responses': responses,
+        'logger': responses.get('logger'),
+        'document_mappings': responses.get('document_mappings'),
+        'document_boundaries': responses.get('document_boundaries'),
+        'queries': responses.get('queries'),
+        }
+    for schema_name, schema in schemas.items():
+        objects['schema:{}'.format(schema_name)] = schema
+    for boundaries_key, boundaries in responses.get('document_boundaries').items():
+        objects['boundaries:{}'.format(boundaries_key)] = boundaries
+        for document_element_or_keyframe_id, boundary in boundaries.get('store').items():
+            objects['boundary:{}:{}'.format(boundaries_key, document_element_or_keyframe_id)] = boundary
+    return SharedObjects(responses.get('logger'), objects)
+
+def init_worker(responses):
+    global WORKER_SHARED_OBJECTS
+    global WORKER_RESPONSE_SET
+    WORKER_SHARED_OBJECTS = get_shared_objects(responses)
+    WORKER_RESPONSE_SET = responses
+    responses.get('logger').defer_events()
+
+def load_kb_in_worker(subdir):
+    return WORKER_RESPONSE_SET.load_kb_in_worker(subdir)
+
 class ResponseSet(Container):
     """
     Set of responses for AIDA.
     """
 
-    def __init__(self, logger, document_mappings, document_boundaries, path, runid, task='task1', queries=None):
+    def __init__(self, logger, document_mappings, document_boundaries, path, runid, task='task1', queries=None, jobs=1, cache_directory=None):
         super().__init__(logger)
+        self.cache = ResponseSetCache(logger, cache_directory) if cache_directory else None
+        self.jobs = jobs
         self.claims = Container(logger)
         self.document_mappings = document_mappings
         self.document_boundaries = document_boundaries
         self.validator = Validator(logger)
         self.generator = Generator(logger)
         self.normalizer = Normalizer(logger)
+        self.pipelines = {}
         self.document_clusters = Container(logger)
         self.document_frames = Container(logger)
         self.queries = queries
@@ -993,8 +1036,62 @@ class ResponseSet(Container):
         self.path = path
         self.task = task
         self.validate_attributes_and_schemas()
-        self.load_responses()
-        self.validate_responses()
+        if self.get('cache') is None:
+            self.load_responses()
+            self.validate_responses()
+        else:
+            cache_key = self.get('cache_key')
+            if not self.load_from_cache(cache_key):
+                logger.capture_events()
+                self.load_responses()
+                self.validate_responses()
+                self.save_to_cache(cache_key, logger.get_captured_events())
+
+    def get_cache_key(self):
+        """
+        Returns the key of the cache file containing the responses of this response set.
+        """
+        document_mappings = self.get('document_mappings')
+        filenames = [document_mappings.get('filename'), document_mappings.get('encodings').get('filename')]
+        if document_mappings.get('core_documents') is not None:
+            filenames.append(document_mappings.get('core_documents').get('filename'))
+        for boundaries_key in sorted(self.get('document_boundaries')):
+            filenames.append(self.get('document_boundaries').get(boundaries_key).get('filename'))
+        directories = [self.get('path')]
+        if self.get('queries'):
+            directories.append(self.get('queries').get('directory'))
+        values = [self.get('task'), self.get('runid'), self.get('path'), repr(attributes), repr(schemas)]
+        return self.get('cache').get('key', values, filenames, directories)
+
+    def load_from_cache(self, cache_key):
+        """
+        Loads the responses from the cache, if available, and records the events
+        that were recorded when the responses were loaded into the cache.
+
+        Returns True if the responses were loaded from the cache, False otherwise.
+        """
+        state = self.get('cache').load(cache_key, get_shared_objects(self))
+        if state is None:
+            return False
+        self.store = state.get('store')
+        self.claims = state.get('claims')
+        self.document_clusters = state.get('document_clusters')
+        self.document_frames = state.get('document_frames')
+        self.get('logger').record_deferred_events(state.get('events'))
+        return True
+
+    def save_to_cache(self, cache_key, events):
+        """
+        Saves the responses, and the events recorded when loading them, to the cache.
+        """
+        state = {
+            'store': self.get('store'),
+            'claims': self.get('claims'),
+            'document_clusters': self.get('document_clusters'),
+            'document_frames': self.get('document_frames'),
+            'events': events,
+            }
+        self.get('cache').save(cache_key, get_shared_objects(self), state)
 
     def load_responses(self):
         method_name = 'load_responses_{task}'.format(task=self.get('task'))
@@ -1004,6 +1101,14 @@ class ResponseSet(Container):
         method()
 
     def load_responses_task1(self):
+        subdirs = ['{}/{}'.format(self.get('path'), d) for d in os.listdir(self.get('path'))]
+        if self.get('jobs') > 1:
+            self.load_kbs_in_parallel(subdirs)
+        else:
+            for subdir in tqdm(subdirs, desc='loading {}'.format(self.get('path'))):
+                self.load_kb(subdir)
+
+    def load_kb(self, subdir):
         def order(filename):
             filename_order_map = {
                 'AIDA_P3_TA1_CM_A0001.rq.tsv': 1,
@@ -1015,22 +1120,80 @@ class ResponseSet(Container):
                 exit()
             return filename_order_map[filename]
         logger = self.get('logger')
-        for subdir in tqdm(['{}/{}'.format(self.get('path'), d) for d in os.listdir(self.get('path'))], desc='loading {}'.format(self.get('path'))):
-            for filename in sorted(os.listdir(subdir), key=order):
-                filename_including_path = '{}/{}'.format(subdir, filename)
-                fh = FileHandler(logger, filename_including_path)
-                schema = identify_file_schema(fh, self.get('task'))
-                if schema is None:
-                    logger.record_event('UNKNOWN_RESPONSE_FILE_TYPE', filename_including_path, self.get('code_location'))
-                else:
-                    self.load_file(fh, schema)
+        for filename in sorted(os.listdir(subdir), key=order):
+            filename_including_path = '{}/{}'.format(subdir, filename)
+            fh = FileHandler(logger, filename_including_path, compact=True, stream=True)
+            schema = identify_file_schema(fh, self.get('task'))
+            if schema is None:
+                logger.record_event('UNKNOWN_RESPONSE_FILE_TYPE', filename_including_path, self.get('code_location'))
+            else:
+                self.load_file(fh, schema)
+
+    def load_kb_in_worker(self, subdir):
+        """
+        Loads the KB in subdir into an empty response set, and returns the tuple
+        (data, deferred_events, error) where data is the pickled tuple containing
+        the per-file containers, the document clusters and the document frames.
+
+        This method is called in a worker process, which works on a copy of this instance.
+        """
+        logger = self.get('logger')
+        data, error = None, None
+        self.store = {}
+        self.document_clusters = Container(logger)
+        self.document_frames = Container(logger)
+        try:
+            self.load_kb(subdir)
+            data = WORKER_SHARED_OBJECTS.dumps((list(self.get('store').items()),
+                                                list(self.get('document_clusters').get('store').items()),
+                                                list(self.get('document_frames').get('store').items())))
+        except BaseException:
+            error = traceback.format_exc()
+        return data, logger.get_deferred_events(), error
+
+    def load_kbs_in_parallel(self, subdirs):
+        """
+        Loads the KBs in subdirs using worker processes.
+
+        The results of the workers are merged, and the events recorded by the workers
+        are recorded, in the order of subdirs as if the KBs were loaded one after another.
+        A KB whose files or documents were already loaded from another KB is loaded
+        again here, in order to add its responses to those already loaded.
+        """
+        logger = self.get('logger')
+        shared_objects = get_shared_objects(self)
+        with ProcessPoolExecutor(max_workers=self.get('jobs'), mp_context=multiprocessing.get_context('fork'), initializer=init_worker, initargs=(self,)) as executor:
+            results = executor.map(load_kb_in_worker, subdirs)
+            for subdir in tqdm(subdirs, desc='loading {}'.format(self.get('path'))):
+                data, deferred_events, error = next(results)
+                files, document_clusters, document_frames = [], [], []
+                if data is not None:
+                    files, document_clusters, document_frames = shared_objects.loads(data)
+                    if any([self.exists(key) for key, _ in files]) \
+                        or any([self.get('document_clusters').exists(key) for key, _ in document_clusters]) \
+                        or any([self.get('document_frames').exists(key) for key, _ in document_frames]):
+                        self.load_kb(subdir)
+                        continue
+                if error is not None:
+                    # the KBs not yet started are not loaded, since the critical error
+                    # recorded below exits
+                    executor.shutdown(cancel_futures=True)
+                logger.record_deferred_events(deferred_events)
+                if error is not None:
+                    logger.record_event('DEFAULT_CRITICAL_ERROR', 'loading {} failed\n{}'.format(subdir, error), self.get('code_location'))
+                for key, value in files:
+                    self.add(key=key, value=value)
+                for key, value in document_clusters:
+                    self.get('document_clusters').add(key=key, value=value)
+                for key, value in document_frames:
+                    self.get('document_frames').add(key=key, value=value)
 
     def load_responses_task2(self):
         logger = self.get('logger')
         path = self.get('path')
         for filename in sorted(os.listdir(path)):
             filename_including_path = '{}/{}'.format(path, filename)
-            fh = FileHandler(logger, filename_including_path, encoding='utf-8')
+            fh = FileHandler(logger, filename_including_path, encoding='utf-8', compact=True, stream=True)
             schema = identify_file_schema(fh, self.get('task'))
             if schema is None:
                 logger.record_event('UNKNOWN_RESPONSE_FILE_TYPE', filename_including_path, self.get('code_location'))
@@ -1071,7 +1234,7 @@ class ResponseSet(Container):
                     for filename in sorted([os.path.join(root, file) for file in files], key=order):
                         filenames.add(filename)
                 for filename in sorted(filenames, key=order):
-                    fh = FileHandler(logger, filename, header=get_header(logger, condition, filename), encoding='utf-8')
+                    fh = FileHandler(logger, filename, header=get_header(logger, condition, filename), encoding='utf-8', compact=True, stream=True)
                     schema = identify_file_schema(fh, self.get('task'))
                     if schema is None:
                         logger.record_event('UNKNOWN_RESPONSE_FILE_TYPE', filename, self.get('code_location'))
@@ -1085,33 +1248,35 @@ class ResponseSet(Container):
             file_container = Container(logger)
             file_container.set('header', fh.get('header'))
             self.add(key=filename, value=file_container)
+        column_map = fh.get('column_map')
+        if column_map is not None:
+            # compact entries share the values that are the same for all the entries of the file,
+            # and look up the schema columns through the column map of the file
+            column_map.set_shared_value('runid', self.get('runid'))
+            column_map.set_shared_value('schema', schema)
+            if self.get('task') == 'task2':
+                column_map.set_shared_value('metatype', 'Entity')
+            column_map.add_aliases(schema.get('columns'))
+        pipeline = self.get('pipeline', schema)
         for entry in fh:
             lineno = entry.get('lineno')
-            entry.set('runid', self.get('runid'))
-            entry.set('schema', schema)
-            if self.get('task') == 'task2':
-                entry.set('metatype', 'Entity')
-            for i in range(len(schema.get('columns'))):
-                entry.set(schema.get('columns')[i], entry.get(entry.get('header').get('columns')[i]))
+            if column_map is None:
+                entry.set('runid', self.get('runid'))
+                entry.set('schema', schema)
+                if self.get('task') == 'task2':
+                    entry.set('metatype', 'Entity')
+                for i in range(len(schema.get('columns'))):
+                    entry.set(schema.get('columns')[i], entry.get(entry.get('header').get('columns')[i]))
             valid = True
-            for attribute_name in attributes:
-                attribute = attributes[attribute_name]
-                if attribute_name != attribute.get('name'):
-                    logger.record_event('DEFAULT_CRITICAL_ERROR',
-                                        'Mismatching name of attribute: {}'.format(attribute_name),
-                                        self.get_code_location())
-                # skip if the attribute is not required for the given schema
-                if not self.attribute_required(attribute, schema): continue
-                # generate value for the attribute, if needed
-                self.generate_value(attribute, entry)
-                # normalize value
-                normalizer_name = attribute.get('normalize')
-                if normalizer_name:
-                    self.get('normalizer').normalize(self, normalizer_name, entry, attribute)
-                # validate value
-                validator_name = attribute.get('validate')
-                if validator_name:
-                    valid_attribute = self.get('validator').validate(self, validator_name, schema, entry, attribute)
+            for step, method, attribute in pipeline:
+                if step == 'generate':
+                    # generate value for the attribute, if needed
+                    if not entry.get(attribute.get('name')):
+                        method(self, entry)
+                elif step == 'normalize':
+                    method(self, entry, attribute)
+                elif step == 'validate':
+                    valid_attribute = method(self, schema, entry, attribute)
                     if not valid_attribute: valid = False
             entry.set('valid', valid)
             if self.get('task') == 'task3':
@@ -1127,17 +1292,65 @@ class ResponseSet(Container):
         if schema.get('name') not in attribute.get('schemas'): return False
         return True
 
-    def generate_value(self, attribute, entry):
+    def add_generate_steps(self, attribute, pipeline):
+        """
+        Adds to the pipeline the steps generating the value for the attribute, if needed,
+        preceded by the steps generating the values of its dependencies.
+        """
         dependencies = attribute.get('dependencies')
         if dependencies:
             for dependency_name in dependencies:
                 dependency = attributes[dependency_name]
-                self.generate_value(dependency, entry)
-        if entry.get(attribute.get('name')):
-            return
+                self.add_generate_steps(dependency, pipeline)
         generator_name = attribute.get('generate')
         if generator_name:
-            self.get('generator').generate(self, generator_name, entry)
+            generator = self.get('generator')
+            method = generator.get_method(generator_name)
+            if method is None:
+                # leave it to the generator to report the undefined method
+                method = lambda responses, entry: generator.generate(responses, generator_name, entry)
+            pipeline.append(('generate', method, attribute))
+
+    def get_pipeline(self, schema):
+        """
+        Returns the ordered list of steps, i.e. tuples (step, method, attribute), that
+        generate, normalize and validate the values of the attributes required for the schema.
+
+        The pipeline is compiled once per schema, and it runs the steps in the order in which
+        they would be run by going over all the attributes for each entry.
+        """
+        schema_name = schema.get('name')
+        if schema_name not in self.get('pipelines'):
+            logger = self.get('logger')
+            pipeline = []
+            for attribute_name in attributes:
+                attribute = attributes[attribute_name]
+                if attribute_name != attribute.get('name'):
+                    logger.record_event('DEFAULT_CRITICAL_ERROR',
+                                        'Mismatching name of attribute: {}'.format(attribute_name),
+                                        self.get_code_location())
+                # skip if the attribute is not required for the given schema
+                if not self.attribute_required(attribute, schema): continue
+                # generate value for the attribute, if needed
+                self.add_generate_steps(attribute, pipeline)
+                # normalize value
+                normalizer_name = attribute.get('normalize')
+                if normalizer_name:
+                    normalizer = self.get('normalizer')
+                    method = normalizer.get_method(normalizer_name)
+                    if method is None:
+                        method = lambda responses, entry, attribute, normalizer_name=normalizer_name: normalizer.normalize(responses, normalizer_name, entry, attribute)
+                    pipeline.append(('normalize', method, attribute))
+                # validate value
+                validator_name = attribute.get('validate')
+                if validator_name:
+                    validator = self.get('validator')
+                    method = validator.get_method(validator_name)
+                    if method is None:
+                        method = lambda responses, schema, entry, attribute, validator_name=validator_name: validator.validate(responses, validator_name, schema, entry, attribute)
+                    pipeline.append(('validate', method, attribute))
+            self.get('pipelines')[schema_name] = pipeline
+        return self.get('pipelines').get(schema_name)
 
     def get_claim(self, claim_uid):
         logger = self.get('logger')
@@ -0,0 +1,133 @@
+"""
+AIDA class for caching the responses loaded into a ResponseSet.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida.object import Object
+
+import glob
+import hashlib
+import os
+import pickle
+
+# the version of the format of the cache files; to be incremented when the format changes
+CACHE_VERSION = 1
+
+class ResponseSetCache(Object):
+    """
+    The on-disk cache of the responses loaded into a ResponseSet.
+
+    Each cache file holds the pickled state of a ResponseSet after its responses were loaded,
+    normalized and validated, together with the events recorded while doing so. The file is
+    named after a hash of the cache version, the values (e.g. the task, the runid and the
+    definitions of the schemas), the contents of the input files, and the code in the
+    aida package, so that a change to any of these results in a cache miss.
+    """
+
+    def __init__(self, logger, directory):
+        """
+        Initializes this instance.
+
+        Arguments:
+            logger (aida.Logger):
+                the aida.Logger object
+            directory (str):
+                the directory containing the cache files. It is created if needed.
+        """
+        super().__init__(logger)
+        self.directory = directory
+
+    def get_key(self, values, filenames, directories):
+        """
+        Returns the key of the cache file.
+
+        Arguments:
+            values (list):
+                the list of values whose string representation is hashed.
+            filenames (list of str):
+                the list of the files whose content is hashed.
+            directories (list of str):
+                the list of the directories whose files, along with their names relative to
+                the directory, are hashed.
+        """
+        hasher = hashlib.sha256()
+        def update(value):
+            hasher.update('{}\n'.format(value).encode('utf-8'))
+        def update_file(filename):
+            with open(filename, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 20), b''):
+                    hasher.update(chunk)
+        update(CACHE_VERSION)
+        for value in values:
+            update(value)
+        for filename in filenames:
+            update(filename)
+            update_file(filename)
+        for directory in directories:
+            update(directory)
+            for root, dirnames, files in os.walk(directory):
+                dirnames.sort()
+                for filename in sorted(files):
+                    filename_including_path = os.path.join(root, filename)
+                    update(os.path.relpath(filename_including_path, directory))
+                    update_file(filename_including_path)
+        for filename in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+            update(os.path.basename(filename))
+            update_file(filename)
+        return hasher.hexdigest()
+
+    def get_filename(self, key):
+        """
+        Returns the name of the cache file corresponding to the key.
+        """
+        return os.path.join(self.get('directory'), '{}.pickle'.format(key))
+
+    def load(self, key, shared_objects):
+        """
+        Returns the state stored in the cache file corresponding to the key, or None if the
+        file does not exist or cannot be read.
+
+        Arguments:
+            key (str):
+                the key of the cache file.
+            shared_objects (aida.SharedObjects):
+                the objects that were pickled by name when the state was stored.
+        """
+        filename = self.get('filename', key)
+        if not os.path.exists(filename):
+            return None
+        try:
+            with open(filename, 'rb') as file:
+                contents = pickle.load(file)
+            if contents.get('version') != CACHE_VERSION or contents.get('key') != key:
+                return None
+            return shared_objects.loads(contents.get('data'))
+        except Exception:
+            return None
+
+    def save(self, key, shared_objects, state):
+        """
+        Stores the state in the cache file corresponding to the key.
+
+        The file is written under a temporary name and then renamed, so that concurrent
+        invocations never read a partially written file.
+
+        Arguments:
+            key (str):
+                the key of the cache file.
+            shared_objects (aida.SharedObjects):
+                the objects to be pickled by name.
+            state (dict):
+                the state to be stored.
+        """
+        os.makedirs(self.get('directory'), exist_ok=True)
+        filename = self.get('filename', key)
+        contents = {'version': CACHE_VERSION, 'key': key, 'data': shared_objects.dumps(state)}
+        temporary_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(temporary_filename, 'wb') as file:
+            pickle.dump(contents, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_filename, filename)
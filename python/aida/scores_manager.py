@@ -13,6 +13,7 @@ from aida.argument_metric_v3b1_scorer import ArgumentMetricScorerV3B1
 from aida.argument_metric_v3b2_scorer import ArgumentMetricScorerV3B2
 from aida.argument_metric_v3c1_scorer import ArgumentMetricScorerV3C1
 from aida.argument_metric_v3c2_scorer import ArgumentMetricScorerV3C2
+from aida.cluster_features import ClusterFeatures
 from aida.container import Container
 from aida.coreference_metric_scorer import CoreferenceMetricScorer
 from aida.f1_v1a_scorer import F1ScorerV1A
@@ -78,6 +79,10 @@ class ScoresManager(Object):
 
     def score_responses(self):
         if self.get('task') == 'task1':
+            cluster_features = ClusterFeatures(self.get('logger'),
+                                               self.get('gold_responses'),
+                                               self.get('system_responses'),
+                                               self.get('cluster_alignment'))
             for metric in self.get('metrics'):
                 scorer = self.get('metrics')[metric](logger=self.get('logger'),
                                                      run_id=self.get('run_id'),
@@ -87,7 +92,8 @@ class ScoresManager(Object):
                                                      cluster_alignment=self.get('cluster_alignment'),
                                                      mention_alignment=self.get('mention_alignment'),
                                                      cluster_self_similarities=self.get('cluster_self_similarities'),
-                                                     type_similarities=self.get('type_similarities'))
+                                                     type_similarities=self.get('type_similarities'),
+                                                     cluster_features=cluster_features)
                 self.get('scores').add(key=metric, value=scorer)
         elif self.get('task') == 'task2':
             for metric in self.get('metrics'):
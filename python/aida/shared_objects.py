@@ -0,0 +1,78 @@
+"""
+AIDA class for pickling objects that refer to shared objects.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida.object import Object
+
+import io
+import pickle
+
+class SharedObjectPickler(pickle.Pickler):
+    """
+    Pickler that stores the name of a shared object instead of the object itself.
+    """
+
+    def __init__(self, file, names):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.names = names
+
+    def persistent_id(self, obj):
+        return self.names.get(id(obj))
+
+class SharedObjectUnpickler(pickle.Unpickler):
+    """
+    Unpickler that replaces the name of a shared object with the object itself.
+    """
+
+    def __init__(self, file, objects):
+        super().__init__(file)
+        self.objects = objects
+
+    def persistent_load(self, name):
+        if name not in self.objects:
+            raise pickle.UnpicklingError('Shared object \'{}\' not found'.format(name))
+        return self.objects[name]
+
+class SharedObjects(Object):
+    """
+    The named objects (e.g. the logger, the document mappings, and the document boundaries)
+    that are shared by the objects being pickled, and which are therefore pickled by their
+    name rather than by value.
+
+    The objects are pickled using dumps, and unpickled using loads, in a process that has
+    the same named objects, e.g. the parent process of a worker process started using fork.
+    """
+
+    def __init__(self, logger, objects):
+        """
+        Initializes this instance.
+
+        Arguments:
+            logger (aida.Logger):
+                the aida.Logger object
+            objects (dict):
+                the dictionary mapping name to the shared object. Entries whose value
+                is None are ignored.
+        """
+        super().__init__(logger)
+        self.objects = {name:obj for name, obj in objects.items() if obj is not None}
+        self.names = {id(obj):name for name, obj in self.get('objects').items()}
+
+    def dumps(self, obj):
+        """
+        Returns the pickled representation of obj as a bytes object.
+        """
+        file = io.BytesIO()
+        SharedObjectPickler(file, self.get('names')).dump(obj)
+        return file.getvalue()
+
+    def loads(self, data):
+        """
+        Returns the object whose pickled representation is the bytes object provided.
+        """
+        return SharedObjectUnpickler(io.BytesIO(data), self.get('objects')).load()
@@ -0,0 +1,157 @@
+"""
+AIDA class for the persistent store of qnode-qnode type similarities.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida.file_handler import FileHandler
+from aida.object import Object
+
+import os
+import sqlite3
+
+# the number of qnode pairs looked up using a single query
+LOOKUP_BATCH_SIZE = 400
+
+# the seconds for which a connection waits for a concurrent writer to release the database
+BUSY_TIMEOUT = 600
+
+class SimilarityStore(Object):
+    """
+    The SQLite database, in write-ahead-log (WAL) mode, mapping a pair of qnodes to their
+    type similarity.
+
+    The database may be shared by concurrent invocations: readers are not blocked by a
+    writer, and writers are serialized by SQLite's own file locking. Only the pairs looked up
+    are read from the database, and only the pairs added or updated by an invocation are
+    written to it.
+
+    The contents of the store can be imported from, and exported to, the tab-separated
+    cache file having the header 'q1\tq2\tsimilarity'. The store records the modification
+    time of the cache file when it was last imported or exported, so that the file is
+    imported again only if it was modified since.
+    """
+
+    def __init__(self, logger, filename):
+        """
+        Initializes this instance.
+
+        Arguments:
+            logger (aida.Logger):
+                the aida.Logger object
+            filename (str):
+                the name of the database file. It is created if needed.
+        """
+        super().__init__(logger)
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS similarities (q1 TEXT NOT NULL, q2 TEXT NOT NULL, similarity REAL NOT NULL, PRIMARY KEY (q1, q2)) WITHOUT ROWID')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cache_files (filename TEXT NOT NULL PRIMARY KEY, mtime_ns INTEGER NOT NULL)')
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.get('connection').close()
+
+    def lookup(self, qnode_pairs):
+        """
+        Returns the dictionary mapping each pair (q1, q2) in qnode_pairs that is found in the
+        store to its similarity.
+        """
+        similarities = {}
+        qnode_pairs = list(qnode_pairs)
+        for start in range(0, len(qnode_pairs), LOOKUP_BATCH_SIZE):
+            batch = qnode_pairs[start:start+LOOKUP_BATCH_SIZE]
+            query = 'SELECT q1, q2, similarity FROM similarities WHERE (q1, q2) IN (VALUES {})'.format(','.join(['(?,?)'] * len(batch)))
+            parameters = [qnode for qnode_pair in batch for qnode in qnode_pair]
+            for q1, q2, similarity in self.get('connection').execute(query, parameters):
+                similarities[(q1, q2)] = similarity
+        return similarities
+
+    def update(self, similarities, overwrite=True):
+        """
+        Writes the similarities to the store, in a single transaction.
+
+        Arguments:
+            similarities (dict):
+                the dictionary mapping the pair (q1, q2) to its similarity.
+            overwrite (bool):
+                if False, the similarity of a pair already in the store is left unchanged.
+        """
+        if len(similarities) == 0:
+            return
+        connection = self.get('connection')
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.write(similarities, overwrite)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def write(self, similarities, overwrite):
+        # write the similarities within the transaction started by the caller
+        if overwrite:
+            statement = 'INSERT INTO similarities (q1, q2, similarity) VALUES (?, ?, ?) ON CONFLICT (q1, q2) DO UPDATE SET similarity=excluded.similarity'
+        else:
+            statement = 'INSERT OR IGNORE INTO similarities (q1, q2, similarity) VALUES (?, ?, ?)'
+        self.get('connection').executemany(statement, ((q1, q2, float(similarity)) for (q1, q2), similarity in similarities.items()))
+
+    def is_import_needed(self, filename, mtime_ns):
+        """
+        Returns True if the cache file, having the modification time mtime_ns, was not
+        imported or exported since it was last modified; returns False otherwise.
+        """
+        row = self.get('connection').execute('SELECT mtime_ns FROM cache_files WHERE filename=?', (os.path.abspath(filename),)).fetchone()
+        return row is None or row[0] < mtime_ns
+
+    def record_cache_file(self, filename, mtime_ns):
+        # record the modification time of the cache file whose contents are in the store
+        self.get('connection').execute('INSERT INTO cache_files (filename, mtime_ns) VALUES (?, ?) ON CONFLICT (filename) DO UPDATE SET mtime_ns=excluded.mtime_ns', (os.path.abspath(filename), mtime_ns))
+
+    def import_cache(self, filename):
+        """
+        Adds the similarities in the cache file to the store, leaving unchanged the
+        similarity of the pairs already in the store.
+
+        The file is not read if it was not modified since it was last imported or exported.
+        """
+        mtime_ns = os.stat(filename).st_mtime_ns
+        if not self.is_import_needed(filename, mtime_ns):
+            return
+        similarities = {}
+        for entry in FileHandler(self.get('logger'), filename, compact=True, stream=True):
+            similarities[(entry.get('q1'), entry.get('q2'))] = entry.get('similarity')
+        connection = self.get('connection')
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # the file may have been imported by a concurrent invocation in the meantime
+            if self.is_import_needed(filename, mtime_ns):
+                self.write(similarities, False)
+                self.record_cache_file(filename, mtime_ns)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def export_cache(self, filename):
+        """
+        Writes the contents of the store to the cache file, sorted by q1 and then by q2.
+
+        The file is written under a temporary name and then renamed, so that concurrent
+        invocations never read a partially written file.
+        """
+        temporary_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(temporary_filename, 'w') as program_output:
+            program_output.write('q1\tq2\tsimilarity\n')
+            for q1, q2, similarity in self.get('connection').execute('SELECT q1, q2, similarity FROM similarities ORDER BY q1, q2'):
+                program_output.write('{}\t{}\t{}\n'.format(q1, q2, similarity))
+        os.replace(temporary_filename, filename)
+        # the exported file holds nothing that is not in the store, and need not be imported
+        self.record_cache_file(filename, os.stat(filename).st_mtime_ns)
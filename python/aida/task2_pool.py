@@ -204,7 +204,7 @@ class Task2Pool(Object):
         previous_pool_dirs = self.get('previous_pool_dirs')
         if previous_pool_dirs is not None:
             for previous_pool_dir in previous_pool_dirs.split(','):
-                for entry in FileHandler(logger, '{}/pool.txt'.format(previous_pool_dir)):
+                for entry in FileHandler(logger, '{}/pool.txt'.format(previous_pool_dir), stream=True):
                     query_id = entry.get('QUERY_ID')
                     document_id = entry.get('DOCUMENT_ID')
                     mention_span = entry.get('MENTION_SPAN')
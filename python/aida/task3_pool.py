@@ -352,6 +352,8 @@ class ClaimMappings(Object):
         for key in kwargs:
             self.set(key, kwargs[key])
         self.mappings = []
+        # the indexes of mappings, built by get_claim_mappings, keyed by the names of the fields matched
+        self.indexes = {}
 
     def add(self, condition, query_id, run_id, rank, claim_id, runs_directory, claim_uid, claim_relations, in_previous_pools):
         def order(claim_relation):
@@ -377,24 +379,30 @@ class ClaimMappings(Object):
                                in_previous_pools=str(in_previous_pools))
         mapping.set('header', self.get('header'))
         mappings.append(mapping)
+        self.indexes = {}
 
     def get_header(self):
         return ['pool_claim_uid', 'condition', 'query_id', 'claim_relations', 'rank', 'run_claim_id', 'run_id', 'runs_directory', 'in_previous_pools']
 
     def get_claim_mappings(self, **kwargs):
-        mappings = []
-        for mapping in self.get('mappings'):
-            matched = True
-            for k,v in kwargs.items():
-                if not mapping.get(k) == v:
-                    matched = False
-            if matched:
-                mappings.append(mapping)
-        return mappings
+        """
+        Returns the list of mappings whose fields match the values provided as kwargs.
+
+        The mappings are looked up in an index keyed by the values of the fields whose
+        names are provided. The index is built when such fields are matched the first time.
+        """
+        fieldnames = tuple(sorted(kwargs))
+        indexes = self.get('indexes')
+        if fieldnames not in indexes:
+            index = {}
+            for mapping in self.get('mappings'):
+                index.setdefault(tuple(mapping.get(k) for k in fieldnames), []).append(mapping)
+            indexes[fieldnames] = index
+        return list(indexes[fieldnames].get(tuple(kwargs[k] for k in fieldnames), []))
 
     def load(self, filename):
         self.filename = filename
-        for entry in FileHandler(self.get('logger'), filename):
+        for entry in FileHandler(self.get('logger'), filename, stream=True):
             self.add(entry.get('condition'),
                      entry.get('query_id'),
                      entry.get('run_id'),
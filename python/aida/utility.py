@@ -8,10 +8,16 @@ __date__    = "28 January 2020"
 
 from aida.span import Span
 from aida.object import Object
+from munkres import Munkres
 import hashlib
 import re
 import sys
 
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
 def get_max_similarity(similarities):
     max_similarity = -1 * sys.maxsize
     for i in similarities:
@@ -35,6 +41,98 @@ def get_cost_matrix(similarities, mappings, type_a='gold', type_b='system'):
         cost_matrix += [cost_row]
     return cost_matrix
 
+def get_assignment(similarities, mappings, type_a='gold', type_b='system'):
+    """
+    Returns the list of (index_a, index_b) pairs, having a non-zero similarity, of the
+    assignment computed by Munkres on the cost matrix returned by get_cost_matrix.
+
+    Only the pairs with a non-zero similarity are considered. The bipartite graph formed
+    by these pairs is split into connected components, and each component is solved on its
+    own using scipy.optimize.linear_sum_assignment, if available, or Munkres otherwise. The
+    rows and columns without a non-zero similarity are skipped altogether, and therefore
+    never appear in the returned list.
+
+    When the best assignment of a component is not unique, the assignment picked depends
+    on how the solver breaks ties, and Munkres is therefore run on the full cost matrix
+    instead, so that the ties are broken exactly as before.
+    """
+    parents = {}
+    def find(node):
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+    edges = {}
+    for id_a in similarities:
+        index_a = mappings[type_a]['id_to_index'].get(id_a)
+        if index_a is None: continue
+        for id_b in similarities[id_a]:
+            index_b = mappings[type_b]['id_to_index'].get(id_b)
+            if index_b is None or similarities[id_a][id_b] <= 0: continue
+            edges[(index_a, index_b)] = similarities[id_a][id_b]
+            node_a, node_b = (type_a, index_a), (type_b, index_b)
+            parents.setdefault(node_a, node_a)
+            parents.setdefault(node_b, node_b)
+            root_a, root_b = find(node_a), find(node_b)
+            if root_a != root_b:
+                parents[root_b] = root_a
+    components = {}
+    for (index_a, index_b) in edges:
+        components.setdefault(find((type_a, index_a)), []).append((index_a, index_b))
+    assignment = []
+    for component_edges in components.values():
+        if len(component_edges) == 1:
+            assignment.extend(component_edges)
+            continue
+        indices_a = sorted(set(index_a for index_a, _ in component_edges))
+        indices_b = sorted(set(index_b for _, index_b in component_edges))
+        positions_a = {index_a: position for position, index_a in enumerate(indices_a)}
+        positions_b = {index_b: position for position, index_b in enumerate(indices_b)}
+        matrix = [[0] * len(indices_b) for _ in indices_a]
+        for (index_a, index_b) in component_edges:
+            matrix[positions_a[index_a]][positions_b[index_b]] = edges[(index_a, index_b)]
+        positions = get_best_positions(matrix)
+        total = sum(matrix[position_a][position_b] for position_a, position_b in positions)
+        # the best assignment is unique if every other assignment leaves out one of its pairs,
+        # and leaving out any one of its pairs lowers the total similarity
+        tolerance = 1e-9 * max(1, abs(total))
+        for position_a, position_b in positions:
+            similarity = matrix[position_a][position_b]
+            if similarity <= 0: continue
+            matrix[position_a][position_b] = 0
+            other_total = sum(matrix[other_a][other_b] for other_a, other_b in get_best_positions(matrix))
+            matrix[position_a][position_b] = similarity
+            if other_total >= total - tolerance:
+                return get_dense_assignment(similarities, mappings, type_a, type_b)
+        for position_a, position_b in positions:
+            if (indices_a[position_a], indices_b[position_b]) in edges:
+                assignment.append((indices_a[position_a], indices_b[position_b]))
+    return sorted(assignment)
+
+def get_best_positions(matrix):
+    """
+    Returns the list of (row, column) pairs of an assignment maximizing the total of the
+    values in the matrix.
+    """
+    if linear_sum_assignment is not None:
+        rows, columns = linear_sum_assignment(matrix, maximize=True)
+        return list(zip(rows.tolist(), columns.tolist()))
+    max_value = max(max(row) for row in matrix)
+    return Munkres().compute([[max_value - value for value in row] for row in matrix])
+
+def get_dense_assignment(similarities, mappings, type_a='gold', type_b='system'):
+    """
+    Returns the list of (index_a, index_b) pairs, having a non-zero similarity, of the
+    assignment computed by Munkres on the cost matrix returned by get_cost_matrix.
+    """
+    assignment = []
+    for index_a, index_b in Munkres().compute(get_cost_matrix(similarities, mappings, type_a, type_b)):
+        id_a = mappings[type_a]['index_to_id'][index_a]
+        id_b = mappings[type_b]['index_to_id'][index_b]
+        if id_a in similarities and similarities[id_a].get(id_b, 0) > 0:
+            assignment.append((index_a, index_b))
+    return sorted(assignment)
+
 def get_top_level_type(cluster_type, metatype):
     expanded_types = get_expanded_types(metatype, cluster_type)
     return sorted(expanded_types, key=len)[0]
@@ -18,14 +18,21 @@ from aida.video_boundaries import VideoBoundaries
 from aida.ontology_type_mappings import OntologyTypeMappings
 from aida.annotated_regions import AnnotatedRegions
 
+from concurrent.futures import ProcessPoolExecutor
+
 import argparse
+import multiprocessing
 import os
 import sys
 import time
+import traceback
 
 ALLOK_EXIT_CODE = 0
 ERROR_EXIT_CODE = 255
 
+# arguments shared by the documents aligned in a worker process; set by init_worker
+WORKER_ARGUMENTS = None
+
 def check_paths(args):
     check_for_paths_existance([args.log_specifications, args.ontology_type_mappings, args.gold, args.system])
     check_for_paths_non_existance([args.alignment, args.similarities])
@@ -73,15 +80,13 @@ def align_clusters(args):
 
     os.mkdir(args.similarities)
     os.mkdir(args.alignment)
+    documents = []
     for entry in sorted(os.scandir(args.gold), key=str):
         if entry.is_dir() and entry.name.endswith('.ttl'):
             kb = entry.name
             document_id = kb.replace('.ttl', '')
             if not document_mappings.get('documents').get(document_id).get('is_core'):
                 continue
-            message = 'aligning clusters in {}'.format(entry.name)
-            logger.record_event('DEFAULT_INFO', message)
-            print('At {}: {}'.format(time.strftime("%m/%d/%Y %H:%M:%S", time.localtime()), message))
 
             gold_mentions = '{}/{}/AIDA_P2_TA1_CM_A0001.rq.tsv'.format(args.gold, kb)
             gold_edges = '{}/{}/AIDA_P2_TA1_AM_A0001.rq.tsv'.format(args.gold, kb)
@@ -96,15 +101,78 @@ def align_clusters(args):
             similarities = '{}/{}.tab'.format(args.similarities, document_id)
             alignment = '{}/{}.tab'.format(args.alignment, document_id)
             check_for_paths_non_existance([similarities, alignment])
-            clusters = Clusters(logger, document_mappings, document_boundaries, annotated_regions, gold_mentions, gold_edges, system_mentions, system_edges, thresholds)
-            clusters.print_similarities(similarities)
-            clusters.print_alignment(alignment)
+            documents.append((kb, gold_mentions, gold_edges, system_mentions, system_edges, similarities, alignment))
+
+    worker_arguments = (logger, document_mappings, document_boundaries, annotated_regions, thresholds, args.vectorized)
+    if args.jobs > 1:
+        # each document is aligned in a worker process, the events recorded by the workers are
+        # deferred and recorded here in the order of the documents, as if aligned one after another
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=multiprocessing.get_context('fork'), initializer=init_worker, initargs=worker_arguments) as executor:
+            results = executor.map(align_document_clusters_in_worker, documents)
+            for document in documents:
+                record_document_message(logger, document)
+                deferred_events, error = next(results)
+                if error is not None:
+                    # the documents not yet started are not aligned; this is done before
+                    # recording the deferred events, which may include a critical event
+                    executor.shutdown(cancel_futures=True)
+                logger.record_deferred_events(deferred_events)
+                if error is not None:
+                    print(error)
+                    exit(ERROR_EXIT_CODE)
+    else:
+        for document in documents:
+            record_document_message(logger, document)
+            align_document_clusters(*worker_arguments, document)
     exit(ALLOK_EXIT_CODE)
 
+def record_document_message(logger, document):
+    message = 'aligning clusters in {}'.format(document[0])
+    logger.record_event('DEFAULT_INFO', message)
+    print('At {}: {}'.format(time.strftime("%m/%d/%Y %H:%M:%S", time.localtime()), message))
+
+def align_document_clusters(logger, document_mappings, document_boundaries, annotated_regions, thresholds, vectorized, document):
+    """
+    Align the clusters in the document, and write the similarities and the alignment.
+
+    Each output file is written to a temporary file first which is then renamed, so
+    that a file is never seen partially written.
+    """
+    kb, gold_mentions, gold_edges, system_mentions, system_edges, similarities, alignment = document
+    clusters = Clusters(logger, document_mappings, document_boundaries, annotated_regions, gold_mentions, gold_edges, system_mentions, system_edges, thresholds, vectorized=vectorized)
+    for filename, print_method in [(similarities, clusters.print_similarities), (alignment, clusters.print_alignment)]:
+        temporary_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        print_method(temporary_filename)
+        os.replace(temporary_filename, filename)
+
+def init_worker(*worker_arguments):
+    global WORKER_ARGUMENTS
+    WORKER_ARGUMENTS = worker_arguments
+    logger = worker_arguments[0]
+    logger.defer_events()
+
+def align_document_clusters_in_worker(document):
+    """
+    Align the clusters in the document inside a worker process.
+
+    Returns the tuple (deferred_events, error), where error is None unless the
+    alignment failed. A failure caused by a deferred CRITICAL event stops the
+    parent process when the deferred events are recorded.
+    """
+    logger = WORKER_ARGUMENTS[0]
+    error = None
+    try:
+        align_document_clusters(*WORKER_ARGUMENTS, document)
+    except (Exception, SystemExit):
+        error = traceback.format_exc()
+    return logger.get_deferred_events(), error
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Align system and gold clusters")
     parser.add_argument('-l', '--log', default='log.txt', help='Specify a file to which log output should be redirected (default: %(default)s)')
     parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__, help='Print version number and exit')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Specify the number of documents to be aligned in parallel (default: %(default)s)')
+    parser.add_argument('-V', '--vectorized', action='store_true', help='Compute mention intersection over union using the vectorized kernel?')
     parser.add_argument('log_specifications', type=str, help='File containing error specifications')
     parser.add_argument('ontology_type_mappings', type=str, help='File containing all the types in the ontology')
     parser.add_argument('encodings', type=str, help='File containing list of encoding to modality mappings')
@@ -7,6 +7,7 @@ __status__  = "production"
 __version__ = "0.0.0.1"
 __date__    = "16 May 2022"
 
+from aida.event_log import read_events
 from aida.file_handler import FileHandler
 from aida.logger import Logger
 
@@ -64,6 +65,11 @@ def parse(line):
                 entry = parsers.get(entry_type)(line, classname, entry_type, entry_str)
             return entry
 
+def parse_event(logger, event_code, classname, args):
+    entry_str = logger.event_specs[event_code]['message'].format(*args)
+    line = '{} - {} - {}'.format(classname, event_code, entry_str)
+    return parsers.get(event_code)(line, classname, event_code, entry_str)
+
 def parse_CLAIM_FIELD_CORRECTNESS(line, classname, entry_type, entry_str):
     return parse_DEFAULT(line, classname, entry_type, entry_str, split_by_1='::', split_by_2=':')
 
@@ -133,7 +139,26 @@ def calculate_gain(fields, value_not_provided_for_fields, incorrect_values):
         gain += float(weights.get(fieldname))
     return fields_counted_as_new, gain
 
-def analyze_part_of_logfile(logger, input_filename, classname, condition, claim_relation, ranking_type, query_id, program_output):
+def load_entries(logger, input_filename, events):
+    """
+    Returns the dictionary mapping (classname, entry_type) to the list of entries, in the
+    order of their appearance in the input, parsed from the score log or, if events is True,
+    from the event log written using the --events option of the scorer.
+    """
+    entries = {}
+    if events:
+        for event_code, classname, args, where in read_events(input_filename, event_codes=set(parsers)):
+            entry = parse_event(logger, event_code, classname, args)
+            entries.setdefault((classname, event_code), []).append(entry)
+    else:
+        with open(input_filename) as fh:
+            for line in fh:
+                entry = parse(line)
+                if entry:
+                    entries.setdefault((entry.get('ENTRY_CLASS'), entry.get('ENTRY_TYPE')), []).append(entry)
+    return entries
+
+def analyze_part_of_logfile(logger, entries, classname, condition, claim_relation, ranking_type, query_id, program_output):
     def matches(entry, **kwargs):
         for key, value in kwargs.items():
             if entry.get(key) != value:
@@ -144,36 +169,25 @@ def analyze_part_of_logfile(logger, input_filename, classname, condition, claim_
     claim_relation_correctness = {}
     claims = {}
     ranking = []
-    with open(input_filename) as fh:
-        for line in fh.readlines():
-            entry = parse(line)
-            if entry:
-                if matches(entry,
-                           ENTRY_CLASS=classname,
-                           CLAIM_RELATION=claim_relation,
-                           ENTRY_TYPE='GAIN_VALUE',
-                           QUERY_ID=query_id,
-                           RANKING_TYPE=ranking_type):
-                    ranking.append(entry)
-                elif matches(entry,
-                             ENTRY_CLASS=classname,
-                             ENTRY_TYPE='CLAIM_FIELD_CORRECTNESS'):
-                    field_name_and_value = '{}:{}'.format(entry.get('FIELD_NAME'), entry.get('FIELD_VALUE'))
-                    claim_field_correctness.setdefault(entry.get('CLAIM_ID'), {})[field_name_and_value] = entry.get('CORRECTNESS')
-                elif matches(entry,
-                             ENTRY_CLASS=classname,
-                             ENTRY_TYPE='CLAIM_RELATION_CORRECTNESS'):
-                    query_id_and_field_name_and_value = '{}:{}:{}'.format(entry.get('QUERY_ID'), entry.get('CLAIM_ID'), entry.get('CLAIM_RELATION'))
-                    claim_relation_correctness[query_id_and_field_name_and_value] = entry.get('CORRECTNESS_SCALE')
-                elif matches(entry,
-                             ENTRY_CLASS=classname,
-                             ENTRY_TYPE='CLAIM_STRING'):
-                    if entry.get('query_claim_frame_id') == query_id:
-                        if query_claim_frame_entry is None:
-                            query_claim_frame_entry = entry
-                        else:
-                            logger.record_event('DEFAULT_CRITICAL_ERROR', 'query_claim_frame_entry is not None')
-                    claims[entry.get('claim_id')] = entry
+    for entry in entries.get((classname, 'GAIN_VALUE'), []):
+        if matches(entry,
+                   CLAIM_RELATION=claim_relation,
+                   QUERY_ID=query_id,
+                   RANKING_TYPE=ranking_type):
+            ranking.append(entry)
+    for entry in entries.get((classname, 'CLAIM_FIELD_CORRECTNESS'), []):
+        field_name_and_value = '{}:{}'.format(entry.get('FIELD_NAME'), entry.get('FIELD_VALUE'))
+        claim_field_correctness.setdefault(entry.get('CLAIM_ID'), {})[field_name_and_value] = entry.get('CORRECTNESS')
+    for entry in entries.get((classname, 'CLAIM_RELATION_CORRECTNESS'), []):
+        query_id_and_field_name_and_value = '{}:{}:{}'.format(entry.get('QUERY_ID'), entry.get('CLAIM_ID'), entry.get('CLAIM_RELATION'))
+        claim_relation_correctness[query_id_and_field_name_and_value] = entry.get('CORRECTNESS_SCALE')
+    for entry in entries.get((classname, 'CLAIM_STRING'), []):
+        if entry.get('query_claim_frame_id') == query_id:
+            if query_claim_frame_entry is None:
+                query_claim_frame_entry = entry
+            else:
+                logger.record_event('DEFAULT_CRITICAL_ERROR', 'query_claim_frame_entry is not None')
+        claims[entry.get('claim_id')] = entry
 
     if condition == 'Condition5':
         ranking.append({'RANK': '-1', 'GAIN':'N/A', 'POOL_CLAIM_ID':query_claim_frame_entry.get('claim_id'), 'QUERY_CLAIM_FRAME_ID':query_claim_frame_entry.get('query_claim_frame_id'), 'IS_QUERY_CLAIM_FRAME': True})
@@ -236,6 +250,7 @@ def analyze_logfile(args):
     input_score_logfilename = args.score_log
     output_directory = args.output
     os.mkdir(output_directory)
+    entries = load_entries(logger, input_score_logfilename, args.events)
     for entry in FileHandler(None, input_score_filename):
         condition = entry.get('Condition')
         query_id = entry.get('QueryID')
@@ -245,11 +260,12 @@ def analyze_logfile(args):
                 for classname in ['NDCGScorerV1', 'NDCGScorerV2']:
                     output_filename = os.path.join(output_directory, 'ranking_{}_{}_{}_{}.txt'.format(classname, query_id, claim_relation, ranking_type))
                     with open(output_filename, 'w') as program_output:
-                        analyze_part_of_logfile(logger, input_score_logfilename, classname, condition, claim_relation, ranking_type, query_id, program_output)
+                        analyze_part_of_logfile(logger, entries, classname, condition, claim_relation, ranking_type, query_id, program_output)
     exit(ALLOK_EXIT_CODE)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Analyze TA3 scorer log output file")
+    parser.add_argument('-e', '--events', action='store_true', help='The input score log file is the event log written using the --events option of the scorer')
     parser.add_argument('-l', '--log', default='log.txt', help='Specify a file to which log output should be redirected (default: %(default)s)')
     parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__, help='Print version number and exit')
     parser.add_argument('log_specifications', type=str, help='File containing error specifications')
@@ -18,21 +18,24 @@ from aida.core_documents import CoreDocuments
 from aida.document_mappings import DocumentMappings
 from aida.excel_workbook import ExcelWorkbook
 from aida.file_handler import FileHandler
+from aida.kgtk_similarity_client import KGTKSimilarityClient
+from aida.similarity_store import SimilarityStore
 from aida.text_boundaries import TextBoundaries
 from aida.image_boundaries import ImageBoundaries
 from aida.keyframe_boundaries import KeyFrameBoundaries
 from aida.utility import get_cost_matrix, get_intersection_over_union, trim_cv
 from aida.video_boundaries import VideoBoundaries
+from concurrent.futures import ProcessPoolExecutor
 from generate_aif import LDCTypeToDWDNodeMapping
 
 import argparse
-import json
+import multiprocessing
+import numpy as np
 import os
-import pandas as pd
-import requests
 import statistics
 import sys
 import time
+import traceback
 
 from munkres import Munkres
 from tqdm import tqdm
@@ -40,10 +43,64 @@ from tqdm import tqdm
 ALLOK_EXIT_CODE = 0
 ERROR_EXIT_CODE = 255
 
+# the object whose methods are run in a worker process, followed by the arguments shared by
+# those runs; set by init_worker
+WORKER_ARGUMENTS = None
+
+def init_worker(*worker_arguments):
+    global WORKER_ARGUMENTS
+    WORKER_ARGUMENTS = worker_arguments
+    worker_object = worker_arguments[0]
+    worker_object.get('logger').defer_events()
+    # the threads requesting similarities from kgtk are not inherited by a forked process
+    kgtk_similarity_client = worker_object.get('similarity').get('kgtk_similarity_client')
+    if kgtk_similarity_client is not None:
+        kgtk_similarity_client.start()
+
+def run_in_worker(method_name, task):
+    """
+    Run the method of the worker object, with the shared arguments followed by the
+    arguments in task, inside a worker process.
+
+    Returns the tuple (result, deferred_events, error), where error is None unless the
+    method failed.
+    """
+    worker_object, shared_arguments = WORKER_ARGUMENTS[0], WORKER_ARGUMENTS[1:]
+    result = None
+    error = None
+    try:
+        result = getattr(worker_object, method_name)(*shared_arguments, *task)
+    except (Exception, SystemExit):
+        error = traceback.format_exc()
+    return result, worker_object.get('logger').get_deferred_events(), error
+
+def run_in_workers(jobs, worker_arguments, method_name, tasks, desc):
+    """
+    Generator of the results of running, in jobs worker processes, the method of the worker
+    object (worker_arguments[0]) for each task in tasks, in the order of the tasks.
+
+    The events recorded by the workers are deferred and recorded here in the order of the
+    tasks, as if the tasks were run one after another.
+    """
+    logger = worker_arguments[0].get('logger')
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork'), initializer=init_worker, initargs=worker_arguments) as executor:
+        results = executor.map(run_in_worker, [method_name] * len(tasks), tasks)
+        for result, deferred_events, error in tqdm(results, total=len(tasks), desc=desc):
+            if error is not None:
+                # the tasks not yet started are not run; this is done before recording the
+                # deferred events, which may include a critical event
+                executor.shutdown(cancel_futures=True)
+            logger.record_deferred_events(deferred_events)
+            if error is not None:
+                print(error)
+                exit(ERROR_EXIT_CODE)
+            yield result
+
 class AlignClusters(Object):
-    def __init__(self, logger, document_mappings, similarity, responses, IOU_THRESHOLDS, MIN_TYPE_SIMILARITY):
+    def __init__(self, logger, document_mappings, similarity, responses, IOU_THRESHOLDS, MIN_TYPE_SIMILARITY, jobs=1):
         super().__init__(logger)
         self.document_mappings = document_mappings
+        self.jobs = jobs
         self.IOU_THRESHOLDS = {}
         self.MIN_TYPE_SIMILARITY = MIN_TYPE_SIMILARITY
         for key_and_value in IOU_THRESHOLDS.split(','):
@@ -53,11 +110,15 @@ class AlignClusters(Object):
         self.similarity = similarity
         self.weighted = 'no'
         self.alignments = {}
+        self.index_cluster_types()
         if self.get('similarity').get('KGTK_SIMILARITY_SERVICE_API'):
             self.get('similarity').build_cache(document_mappings, responses)
         self.align_clusters()
-        if self.get('similarity').get('KGTK_SIMILARITY_SERVICE_API') and self.get('similarity').get('CACHE'):
+        if self.get('similarity').get('KGTK_SIMILARITY_SERVICE_API') and (self.get('similarity').get('CACHE') or self.get('similarity').get('store') is not None):
             self.get('similarity').flush_cache()
+        if self.get('similarity').get('store') is not None:
+            # the store is only used for reading and writing the cache
+            self.get('similarity').get('store').close()
 
     def get_cluster(self, gold_or_system, document_id, cluster_id):
         return self.get('responses').get(gold_or_system).get('document_clusters').get(document_id).get(cluster_id)
@@ -68,6 +129,34 @@ class AlignClusters(Object):
             cluster_types.add((trim_cv(entry.get('cluster_membership_confidence')) * trim_cv(entry.get('type_statement_confidence')), entry.get('cluster_type')))
         return cluster_types
 
+    def index_cluster_types(self):
+        # index the distinct qnode types of gold and system clusters in each document, and represent
+        # the types of each cluster by the vectors of confidences and of the indices of the types
+        self.document_qnodes = {}
+        self.cluster_type_vectors = {}
+        document_qnode_indices = {}
+        for gold_or_system in ['gold', 'system']:
+            document_clusters = self.get('responses').get(gold_or_system).get('document_clusters')
+            for document_id in document_clusters:
+                qnodes = self.get('document_qnodes').setdefault(document_id, [])
+                qnode_indices = document_qnode_indices.setdefault(document_id, {})
+                for cluster_id in document_clusters.get(document_id):
+                    confidences = []
+                    indices = []
+                    for (confidence, qnode) in self.get('cluster_types', gold_or_system, document_id, cluster_id):
+                        if qnode not in qnode_indices:
+                            qnode_indices[qnode] = len(qnodes)
+                            qnodes.append(qnode)
+                        confidences.append(confidence)
+                        indices.append(qnode_indices[qnode])
+                    self.get('cluster_type_vectors')[(gold_or_system, document_id, cluster_id)] = (np.array(confidences, dtype=float), np.array(indices, dtype=np.intp))
+        # the similarity of the pair of qnodes, of a document, at the corresponding indices; nan if
+        # not yet computed. Only the clusters in the same document are compared, and therefore
+        # each document has its own matrix.
+        self.type_similarity_matrices = {}
+        for document_id, qnodes in self.get('document_qnodes').items():
+            self.get('type_similarity_matrices')[document_id] = np.full((len(qnodes), len(qnodes)), np.nan)
+
     def get_document_cluster_similarities(self, document_id):
         similarities = {}
         for gold_cluster_id in sorted(self.get('responses').get('gold').get('document_clusters').get(document_id) or []):
@@ -151,33 +240,81 @@ class AlignClusters(Object):
             return '{}:{}'.format(language, modality).lower()
         self.record_event('DEFAULT_CRITICAL_ERROR', 'modality and language both need to be specified')
 
-    def get_type_similarity(self, document_id, system_or_gold1, cluster_id1, system_or_gold2, cluster_id2, combine=max):
-        cluster1_types = self.get('cluster_types', system_or_gold1, document_id, cluster_id1)
-        cluster2_types = self.get('cluster_types', system_or_gold2, document_id, cluster_id2)
-        similarities = []
-        for (conf1, q1) in cluster1_types:
-            for (conf2, q2) in cluster2_types:
-                similarities.append(conf1 * conf2 * self.get('similarity').similarity(q1, q2))
-        similarity = combine(similarities)
-        return similarity
+    def get_type_similarity(self, document_id, system_or_gold1, cluster_id1, system_or_gold2, cluster_id2):
+        confidences1, indices1 = self.get('cluster_type_vectors').get((system_or_gold1, document_id, cluster_id1))
+        confidences2, indices2 = self.get('cluster_type_vectors').get((system_or_gold2, document_id, cluster_id2))
+        type_similarity_matrix = self.get('type_similarity_matrices').get(document_id)
+        similarities = type_similarity_matrix[indices1[:, np.newaxis], indices2]
+        missing = np.isnan(similarities)
+        if missing.any():
+            # compute the similarities of the pairs of qnodes compared for the first time
+            qnodes = self.get('document_qnodes').get(document_id)
+            for i, j in zip(*np.nonzero(missing)):
+                similarity = self.get('similarity').similarity(qnodes[indices1[i]], qnodes[indices2[j]])
+                type_similarity_matrix[indices1[i], indices2[j]] = similarity
+                similarities[i, j] = similarity
+        return float((confidences1[:, np.newaxis] * confidences2 * similarities).max())
 
     def align_clusters(self):
+        document_ids = list(self.get('document_mappings').get('core_documents'))
+        if self.get('jobs') > 1:
+            # the similarities are computed here, so that those cached are the same as when
+            # the documents are aligned one after another, and each document is then aligned
+            # in a worker process
+            document_cluster_ids = {}
+            for document_id in document_ids:
+                document_cluster_ids[document_id] = {gold_or_system: sorted(self.get('responses').get(gold_or_system).get('document_clusters').get(document_id) or [])
+                                                     for gold_or_system in ['gold', 'system']}
+            self.resolve_type_similarities(document_cluster_ids, [('gold', 'system')])
+            tasks = [(document_id,) for document_id in document_ids]
+            results = run_in_workers(self.get('jobs'), (self,), 'align_document_clusters', tasks, 'Aligning clusters')
+            for document_alignments, document_id in zip(results, document_ids):
+                if document_alignments is not None:
+                    self.get('alignments')[document_id] = document_alignments
+        else:
+            for document_id in tqdm(document_ids, desc='Aligning clusters'):
+                self.align_document_clusters(document_id)
+
+    def align_document_clusters(self, document_id):
+        """
+        Align the gold and system clusters in the document, and return the alignments of the
+        document.
+        """
         mappings = {}
         filetype_to_clusternum_mapping = {
             'gold': 'cluster1',
             'system': 'cluster2'
             }
-        for document_id in tqdm(self.get('document_mappings').get('core_documents'), desc='Aligning clusters'):
-            self.record_event('DEFAULT_INFO', 'aligning clusters from document {}'.format(document_id))
-            for filetype in ['gold', 'system']:
-                clusternum = filetype_to_clusternum_mapping[filetype]
-                mappings[clusternum] = {'id_to_index': {}, 'index_to_id': {}}
-                index = 0
-                for cluster_id in sorted(self.get('responses').get(filetype).get('document_clusters').get(document_id) or []):
-                    mappings[clusternum]['id_to_index'][cluster_id] = index
-                    mappings[clusternum]['index_to_id'][index] = cluster_id
-                    index += 1
-            self.record_alignment(document_id, 'cluster', 'gold_to_system', None, self.get('document_cluster_similarities', document_id), mappings)
+        self.record_event('DEFAULT_INFO', 'aligning clusters from document {}'.format(document_id))
+        for filetype in ['gold', 'system']:
+            clusternum = filetype_to_clusternum_mapping[filetype]
+            mappings[clusternum] = {'id_to_index': {}, 'index_to_id': {}}
+            index = 0
+            for cluster_id in sorted(self.get('responses').get(filetype).get('document_clusters').get(document_id) or []):
+                mappings[clusternum]['id_to_index'][cluster_id] = index
+                mappings[clusternum]['index_to_id'][index] = cluster_id
+                index += 1
+        self.record_alignment(document_id, 'cluster', 'gold_to_system', None, self.get('document_cluster_similarities', document_id), mappings)
+        return self.get('alignments').get(document_id)
+
+    def resolve_type_similarities(self, document_cluster_ids, pairs_of_system_or_gold):
+        """
+        Compute the type similarities of the clusters, in each document, having the same metatype,
+        so that the worker processes only look them up.
+
+        Arguments:
+            document_cluster_ids (dict):
+                the dictionary mapping the document ID to the dictionary mapping 'gold' and 'system'
+                to the list of the IDs of the clusters compared.
+            pairs_of_system_or_gold (list):
+                the list of pairs (system_or_gold1, system_or_gold2) of the clusters compared.
+        """
+        for document_id, cluster_ids in document_cluster_ids.items():
+            for system_or_gold1, system_or_gold2 in pairs_of_system_or_gold:
+                for cluster_id1 in cluster_ids.get(system_or_gold1):
+                    for cluster_id2 in cluster_ids.get(system_or_gold2):
+                        if self.get('metatype_similarity', document_id, system_or_gold1, cluster_id1, system_or_gold2, cluster_id2) > 0:
+                            self.get('type_similarity', document_id, system_or_gold1, cluster_id1, system_or_gold2, cluster_id2)
 
     def init_alignment(self, document_id, cluster_or_mention, alignment_type, cluster1_and_cluster2_ids):
         if cluster1_and_cluster2_ids is None:
@@ -230,6 +367,30 @@ class AlignClusters(Object):
                 self.record_event('ALIGNMENT_INFO', document_id, cluster_or_mention, cluster1_and_cluster2_ids, item1_id, item2_id, similarity)
 
     def print_similarities(self, output_dir):
+        os.mkdir(output_dir)
+        document_ids = list(self.get('alignments'))
+        if self.get('jobs') > 1:
+            # the type similarities are computed here, and the similarities of each document are
+            # then printed in a worker process; the mention alignments recorded when printing are
+            # passed back as part of the alignments
+            document_cluster_ids = {document_id: self.get('aligned_cluster_ids', document_id) for document_id in document_ids}
+            if self.get('similarity').get('kgtk_similarity_client') is not None:
+                for document_id in document_ids:
+                    self.request_type_similarities_ahead(document_id, document_cluster_ids[document_id])
+            self.resolve_type_similarities(document_cluster_ids, [('system', 'system'), ('system', 'gold'), ('gold', 'gold')])
+            tasks = [(output_dir, document_id) for document_id in document_ids]
+            results = run_in_workers(self.get('jobs'), (self,), 'print_document_similarities', tasks, 'Printing similarities')
+            for document_alignments, document_id in zip(results, document_ids):
+                self.get('alignments')[document_id] = document_alignments
+        else:
+            for document_id in tqdm(document_ids, desc='Printing similarities'):
+                self.print_document_similarities(output_dir, document_id)
+
+    def print_document_similarities(self, output_dir, document_id):
+        """
+        Print the similarities of the clusters in the document, and return the alignments of
+        the document.
+        """
         def tostring(entry=None):
             columns = ['metatype', 'system_or_gold1', 'cluster1', 'system_or_gold2', 'cluster2', 'type_similarity', 'similarity']
             values = []
@@ -237,33 +398,52 @@ class AlignClusters(Object):
                 value = column if entry is None else str(entry.get(column))
                 values.append(value)
             return '{}\n'.format('\t'.join(values))
-        os.mkdir(output_dir)
-        for document_id in tqdm(self.get('alignments'), desc='Printing similarities'):
-            cluster_ids = {
-                'system': list(sorted(self.get('alignments').get(document_id).get('cluster').get('system_to_gold').keys())),
-                'gold': list(sorted(self.get('alignments').get(document_id).get('cluster').get('gold_to_system').keys()))
-                }
-            with open(os.path.join(output_dir, '{}.tab'.format(document_id)), 'w') as program_output:
-                program_output.write(tostring())
-                for system_or_gold1, system_or_gold2 in [('system', 'system'), ('system', 'gold'), ('gold', 'gold')]:
-                    for cluster1 in cluster_ids.get(system_or_gold1):
-                        metatype = self.get('cluster', system_or_gold1, document_id, cluster1).get('metatype')
-                        for cluster2 in cluster_ids.get(system_or_gold2):
-                            similarity = self.get('metatype_similarity', document_id, system_or_gold1, cluster1, system_or_gold2, cluster2)
-                            if similarity > 0:
-                                type_similarity = self.get('type_similarity', document_id, system_or_gold1, cluster1, system_or_gold2, cluster2)
-                                similarity *= self.get('mention_similarity', document_id, system_or_gold1, cluster1, system_or_gold2, cluster2)
-                                similarity *= type_similarity
-                                entry = {
-                                    'metatype': metatype,
-                                    'system_or_gold1': system_or_gold1,
-                                    'cluster1': cluster1,
-                                    'system_or_gold2': system_or_gold2,
-                                    'cluster2': cluster2,
-                                    'type_similarity': type_similarity,
-                                    'similarity': similarity,
-                                    }
-                                program_output.write(tostring(entry))
+        cluster_ids = self.get('aligned_cluster_ids', document_id)
+        if self.get('similarity').get('kgtk_similarity_client') is not None:
+            self.request_type_similarities_ahead(document_id, cluster_ids)
+        with open(os.path.join(output_dir, '{}.tab'.format(document_id)), 'w') as program_output:
+            program_output.write(tostring())
+            for system_or_gold1, system_or_gold2 in [('system', 'system'), ('system', 'gold'), ('gold', 'gold')]:
+                for cluster1 in cluster_ids.get(system_or_gold1):
+                    metatype = self.get('cluster', system_or_gold1, document_id, cluster1).get('metatype')
+                    for cluster2 in cluster_ids.get(system_or_gold2):
+                        similarity = self.get('metatype_similarity', document_id, system_or_gold1, cluster1, system_or_gold2, cluster2)
+                        if similarity > 0:
+                            type_similarity = self.get('type_similarity', document_id, system_or_gold1, cluster1, system_or_gold2, cluster2)
+                            similarity *= self.get('mention_similarity', document_id, system_or_gold1, cluster1, system_or_gold2, cluster2)
+                            similarity *= type_similarity
+                            entry = {
+                                'metatype': metatype,
+                                'system_or_gold1': system_or_gold1,
+                                'cluster1': cluster1,
+                                'system_or_gold2': system_or_gold2,
+                                'cluster2': cluster2,
+                                'type_similarity': type_similarity,
+                                'similarity': similarity,
+                                }
+                            program_output.write(tostring(entry))
+        return self.get('alignments').get(document_id)
+
+    def get_aligned_cluster_ids(self, document_id):
+        # the sorted IDs of the system and gold clusters in the alignment of the document
+        return {
+            'system': list(sorted(self.get('alignments').get(document_id).get('cluster').get('system_to_gold').keys())),
+            'gold': list(sorted(self.get('alignments').get(document_id).get('cluster').get('gold_to_system').keys()))
+            }
+
+    def request_type_similarities_ahead(self, document_id, cluster_ids):
+        # request ahead the similarities of the types of the clusters having the same metatype
+        qnode_pairs = set()
+        for system_or_gold1, system_or_gold2 in [('system', 'system'), ('system', 'gold'), ('gold', 'gold')]:
+            for cluster1 in cluster_ids.get(system_or_gold1):
+                cluster1_types = self.get('cluster_types', system_or_gold1, document_id, cluster1)
+                for cluster2 in cluster_ids.get(system_or_gold2):
+                    if self.get('metatype_similarity', document_id, system_or_gold1, cluster1, system_or_gold2, cluster2) > 0:
+                        cluster2_types = self.get('cluster_types', system_or_gold2, document_id, cluster2)
+                        for (_, q1) in cluster1_types:
+                            for (_, q2) in cluster2_types:
+                                qnode_pairs.add((q1, q2))
+        self.get('similarity').request_ahead(sorted(qnode_pairs))
 
     def print_alignment(self, output_dir):
         def tostring(columns, entry=None):
@@ -333,20 +513,65 @@ class AlignClusters(Object):
                             cluster_alignment_program_output.write(tostring(cluster_alignment_columns, entry))
 
 class ResponseFilter(Object):
-    def __init__(self, logger, alignment, similarity):
+    def __init__(self, logger, alignment, similarity, jobs=1):
         super().__init__(logger)
         self.alignment = alignment
         self.similarity = similarity
+        self.jobs = jobs
         self.alignments = {}
         self.filtered_clusters = {}
 
     def apply(self, responses):
         for schema_name in ['AIDA_PHASE3_TASK1_CM_RESPONSE', 'AIDA_PHASE3_TASK1_AM_RESPONSE', 'AIDA_PHASE3_TASK1_TM_RESPONSE']:
-            for input_filename in tqdm(responses, desc='Applying filter ({})'.format(schema_name)):
-                for linenum in responses.get(input_filename):
-                    entry = responses.get(input_filename).get(str(linenum))
-                    if entry.get('schema').get('name') == schema_name:
-                        self.apply_filter_to_entry(entry, schema_name)
+            input_filenames = list(responses)
+            desc = 'Applying filter ({})'.format(schema_name)
+            if self.get('jobs') > 1 and schema_name == 'AIDA_PHASE3_TASK1_CM_RESPONSE':
+                # the verdicts of the cluster types are computed here, and the cluster membership
+                # entries of each file are then filtered in a worker process; the remaining entries
+                # only look up the clusters that passed the filter
+                self.resolve_filter_verdicts(responses, schema_name)
+                tasks = [(schema_name, input_filename) for input_filename in input_filenames]
+                results = run_in_workers(self.get('jobs'), (self, responses), 'apply_filter_to_file', tasks, desc)
+                for passes_filter, input_filename in zip(results, input_filenames):
+                    for linenum in passes_filter:
+                        entry = responses.get(input_filename).get(str(linenum))
+                        entry.set('passes_filter', passes_filter[linenum])
+                        self.update_filtered_clusters(entry, passes_filter[linenum])
+            else:
+                for input_filename in tqdm(input_filenames, desc=desc):
+                    self.apply_filter_to_file(responses, schema_name, input_filename)
+
+    def apply_filter_to_file(self, responses, schema_name, input_filename):
+        """
+        Apply the filter to the entries of the schema in the file, and return the dictionary
+        mapping the line number of each such entry to whether it passes the filter.
+        """
+        passes_filter = {}
+        for linenum in responses.get(input_filename):
+            entry = responses.get(input_filename).get(str(linenum))
+            if entry.get('schema').get('name') == schema_name:
+                self.apply_filter_to_entry(entry, schema_name)
+                passes_filter[linenum] = entry.get('passes_filter')
+        return passes_filter
+
+    def resolve_filter_verdicts(self, responses, schema_name):
+        # compute, in the order of the entries, the verdicts of the types of the clusters not aligned
+        # to a gold cluster, i.e. of the types for which the filter is applied
+        for input_filename in responses:
+            for linenum in responses.get(input_filename):
+                entry = responses.get(input_filename).get(str(linenum))
+                if entry.get('schema').get('name') == schema_name:
+                    if not self.get('alignment').is_aligned_to_a_gold_cluster(entry.get('document_id'), entry.get('cluster').get('ID')):
+                        self.get('similarity').passes_filter(entry.get('cluster_type'))
+
+    def update_filtered_clusters(self, entry, passes_filter):
+        # a cluster passes the filter if any of its cluster membership entries passes the filter
+        filtered_clusters = self.get('filtered_clusters')
+        key = '{}:{}'.format(entry.get('kb_document_id'), entry.get('cluster').get('ID'))
+        if key not in filtered_clusters:
+            filtered_clusters[key] = False
+        if passes_filter:
+            filtered_clusters[key] = True
 
     def apply_filter_to_entry(self, entry, schema_name):
         logger = self.get('logger')
@@ -375,15 +600,11 @@ class ResponseFilter(Object):
                     logger.record_event('MISSING_ENTRY_IN_LOOKUP_ERROR', key, 'filtered_clusters', entry.get('code_location'))
 
         elif schema_name == 'AIDA_PHASE3_TASK1_CM_RESPONSE':
-            key = '{}:{}'.format(entry.get('kb_document_id'), entry.get('cluster').get('ID'))
-            cluster_type = entry.get('cluster_type')
-            if key not in filtered_clusters:
-                filtered_clusters[key] = False
             if self.passes_filter(entry):
                 passes_filter = True
-                filtered_clusters[key] = True
             else:
                 logger.record_event('MENTION_NOT_ANNOTATED', entry.get('mention_span_text'), entry.get('where'))
+            self.update_filtered_clusters(entry, passes_filter)
 
         elif schema_name == 'AIDA_PHASE3_TASK1_TM_RESPONSE':
             cluster_id = entry.get('subject_cluster').get('ID')
@@ -411,7 +632,7 @@ class ResponseFilter(Object):
         return False
 
 class Similarity(Object):
-    def __init__(self, logger, taggable_dwd_ontology, alpha, combine=statistics.mean, LOCK=None, ACQUIRE_LOCK_WAIT=10, NN_SIMILARITY_SCORE=0.9, SIMILARITY_TYPES=None, KGTK_SIMILARITY_SERVICE_API=None, CACHE=None):
+    def __init__(self, logger, taggable_dwd_ontology, alpha, combine=statistics.mean, LOCK=None, ACQUIRE_LOCK_WAIT=10, NN_SIMILARITY_SCORE=0.9, SIMILARITY_TYPES=None, KGTK_SIMILARITY_SERVICE_API=None, KGTK_MAX_REQUESTS=4, CACHE=None, STORE=None):
         super().__init__(logger)
         self.alpha = alpha
         self.combine = combine
@@ -422,7 +643,18 @@ class Similarity(Object):
         self.NN_SIMILARITY_SCORE = NN_SIMILARITY_SCORE
         self.SIMILARITY_TYPES = [t.strip() for t in SIMILARITY_TYPES.split(',')]
         self.KGTK_SIMILARITY_SERVICE_API = None if KGTK_SIMILARITY_SERVICE_API=='None' else KGTK_SIMILARITY_SERVICE_API
+        self.kgtk_similarity_client = None
+        if self.KGTK_SIMILARITY_SERVICE_API is not None:
+            self.kgtk_similarity_client = KGTKSimilarityClient(logger, self.KGTK_SIMILARITY_SERVICE_API, self.SIMILARITY_TYPES, combine, max_requests=KGTK_MAX_REQUESTS)
         self.cached_similarity_scores = {}
+        self.filter_verdicts = {}
+        # the qnode pairs whose similarity was added or updated since it was read from the cache or the store
+        self.updated_qnode_pairs = set()
+        # the updated qnode pairs whose similarity was raised to the near neighbor similarity score,
+        # and which therefore replaces the similarity in the store
+        self.overwritten_qnode_pairs = set()
+        # the similarity store, if provided, is used instead of the lock file for sharing the cache
+        self.store = None if STORE is None else SimilarityStore(logger, STORE)
 
     def acquire_lock(self, read_or_write='write'):
         lock = self.get('LOCK')
@@ -443,25 +675,19 @@ class Similarity(Object):
         print(' acquired')
 
     def build_cache(self, document_mappings, responses):
-        def call_kgtk_api(input_files, url):
-            for input_file in tqdm(sorted(input_files, key=lambda f: int(f.split('.')[0].split('_')[2])), desc='calling tqdm-similarity api'):
-                file_name = os.path.basename(input_file)
-                files = {
-                    'file': (file_name, open(input_file, mode='rb'), 'application/octet-stream')
-                }
-                resp = requests.post(url, files=files, params={'similarity_types': ','.join(sorted(self.get('SIMILARITY_TYPES')))})
-                s = json.loads(resp.json())
-                output_file = '{}_output.txt'.format(input_file.split('.txt')[0])
-                pd.DataFrame(s).to_csv(output_file, index=False, sep='\t')
-
         # read cached similarities passed as input
         if self.get('CACHE') is not None and os.path.exists(self.get('CACHE')):
-            self.acquire_lock(read_or_write='read')
-            for entry in FileHandler(self.get('logger'), self.get('CACHE')):
-                self.cache(entry.get('q1'), entry.get('q2'), entry.get('similarity'))
-            self.release_lock()
+            if self.get('store') is not None:
+                self.get('store').import_cache(self.get('CACHE'))
+            else:
+                self.acquire_lock(read_or_write='read')
+                for entry in FileHandler(self.get('logger'), self.get('CACHE')):
+                    self.cache(entry.get('q1'), entry.get('q2'), entry.get('similarity'), updated=False)
+                self.release_lock()
 
         qnode_pairs = set()
+        # the qnode pairs whose similarity is needed for aligning gold and system clusters
+        alignment_qnode_pairs = set()
         for document_id in document_mappings.get('core_documents'):
             for system_or_gold1, system_or_gold2 in [('system', 'system'), ('system', 'gold'), ('gold', 'gold')]:
                 for cluster_id1 in responses.get(system_or_gold1).get('document_clusters').get(document_id) or []:
@@ -471,6 +697,13 @@ class Similarity(Object):
                         for cluster1_type in cluster1_types:
                             for cluster2_type in cluster2_types:
                                 qnode_pairs.add((cluster1_type[1], cluster2_type[1]))
+                        if (system_or_gold1, system_or_gold2) == ('system', 'gold'):
+                            cluster1 = responses.get('system').get('document_clusters').get(document_id).get(cluster_id1)
+                            cluster2 = responses.get('gold').get('document_clusters').get(document_id).get(cluster_id2)
+                            if cluster1.get('metatype') == cluster2.get('metatype'):
+                                for cluster1_type in cluster1_types:
+                                    for cluster2_type in cluster2_types:
+                                        alignment_qnode_pairs.add((cluster2_type[1], cluster1_type[1]))
 
             for cluster_id in responses.get('system').get('document_clusters').get(document_id) or []:
                 cluster_types = self.get('cluster_types', responses, 'system', document_id, cluster_id)
@@ -480,57 +713,60 @@ class Similarity(Object):
                         for taggable_dwd_type in taggable_dwd_ontology.get('taggable_dwd_types'):
                             qnode_pairs.add((cluster_type[1], taggable_dwd_type))
 
-        # generate input files to be used by kgtk similarity service batch api calls
-        max_entries = 25
-        count = 0
-        filenum = 0
-        input_files = set()
-        cached_output = None
-        for (q1, q2) in sorted(qnode_pairs):
-            if q1 == q2: continue
-            if self.get('cached_similarity_score', q1, q2) is not None: continue
-            if self.get('taggable_dwd_ontology').is_synonym(q1, q2): continue
-            if count == 0:
-                if cached_output is not None:
-                    cached_output.close()
-                    cached_output = None
-                filename = '/tmp/kgtk_cache_{}.txt'.format(filenum)
-                cached_output = open(filename, 'w')
-                cached_output.write('q1\tq2\n')
-                input_files.add(filename)
-                filenum += 1
-                count = max_entries
-            count -= 1
-            cached_output.write('{}\t{}\n'.format(q1, q2))
-
-        if cached_output is not None: cached_output.close()
-
-        call_kgtk_api(input_files, self.get('KGTK_SIMILARITY_SERVICE_API'))
-
-        # load the similarity output files
-        for input_file in input_files:
-            output_file = '{}_output.txt'.format(input_file.split('.txt')[0])
-            for entry in FileHandler(self.get('logger'), output_file):
-                q1 = entry.get('q1')
-                q2 = entry.get('q2')
-                similarity = []
-                for similarity_type in self.get('SIMILARITY_TYPES'):
-                    similarity_value = entry.get(similarity_type)
-                    similarity_value = 0.0 if similarity_value == '' else similarity_value
-                    similarity.append(float(similarity_value))
-                score = self.get('combine')(similarity) if len(similarity) else 0
-                self.cache(q1, q2, score)
-
-    def cache(self, q1, q2, similarity):
+        # read the stored similarities of the qnode pairs, including those needed for alignment
+        if self.get('store') is not None:
+            stored_similarities = self.get('store').lookup([(q1, q2) for (q1, q2) in qnode_pairs | alignment_qnode_pairs if q1 != q2])
+            for (q1, q2), similarity in stored_similarities.items():
+                self.cache(q1, q2, similarity, updated=False)
+
+        # request the similarities of the qnode pairs not cached from the kgtk similarity service
+        # so that all the pairs are resolved before the clusters are aligned
+        qnode_pairs_to_request = {(q1, q2) for (q1, q2) in qnode_pairs if self.is_kgtk_similarity_needed(q1, q2)}
+        kgtk_similarity_client = self.get('kgtk_similarity_client')
+        for (q1, q2), score in kgtk_similarity_client.get('batched_similarities', qnode_pairs_to_request).items():
+            self.cache(q1, q2, score)
+        # request individually the pairs needed for alignment but not returned by the batch api; the
+        # remaining pairs are requested individually only if needed when applying the filter
+        missing_qnode_pairs = {(q1, q2) for (q1, q2) in alignment_qnode_pairs if self.is_kgtk_similarity_needed(q1, q2)}
+        for (q1, q2), score in kgtk_similarity_client.get('similarities', missing_qnode_pairs).items():
+            self.cache(q1, q2, score)
+
+    def is_kgtk_similarity_needed(self, q1, q2):
+        if q1 == q2:
+            return False
+        if self.get('cached_similarity_score', q1, q2) is not None:
+            return False
+        if self.get('taggable_dwd_ontology').is_synonym(q1, q2):
+            return False
+        return True
+
+    def cache(self, q1, q2, similarity, updated=True, overwrite=False):
         self.get('cached_similarity_scores').setdefault(q1, {})[q2] = float(similarity)
+        if updated:
+            self.get('updated_qnode_pairs').add((q1, q2))
+            if overwrite:
+                self.get('overwritten_qnode_pairs').add((q1, q2))
 
     def flush_cache(self):
-        if self.get('CACHE'):
+        if self.get('store') is not None:
+            # write only the updated similarities to the store, and export the store to the cache file;
+            # a similarity stored in the meantime by a concurrent run is left unchanged, unless it was
+            # raised here to the near neighbor similarity score
+            overwritten_qnode_pairs = self.get('overwritten_qnode_pairs')
+            updated_similarities = {(q1, q2): self.get('cached_similarity_score', q1, q2) for (q1, q2) in self.get('updated_qnode_pairs')}
+            if len(updated_similarities):
+                self.get('store').update({qnode_pair: similarity for qnode_pair, similarity in updated_similarities.items() if qnode_pair not in overwritten_qnode_pairs}, overwrite=False)
+                self.get('store').update({qnode_pair: similarity for qnode_pair, similarity in updated_similarities.items() if qnode_pair in overwritten_qnode_pairs}, overwrite=True)
+                if self.get('CACHE'):
+                    self.get('store').export_cache(self.get('CACHE'))
+            self.get('updated_qnode_pairs').clear()
+            overwritten_qnode_pairs.clear()
+        elif self.get('CACHE'):
             self.acquire_lock(read_or_write='write')
             # reload cache
             if os.path.exists(self.get('CACHE')):
                 for entry in FileHandler(self.get('logger'), self.get('CACHE')):
-                    self.cache(entry.get('q1'), entry.get('q2'), entry.get('similarity'))
+                    self.cache(entry.get('q1'), entry.get('q2'), entry.get('similarity'), updated=False)
             # write the updated cache to file
             with open(self.get('CACHE'), 'w') as program_output:
                 program_output.write('q1\tq2\tsimilarity\n')
@@ -568,7 +804,7 @@ class Similarity(Object):
             if cached_similarity_score is not None:
                 if similarity > cached_similarity_score:
                     cached_similarity_score = similarity
-                    self.cache(q1, q2, cached_similarity_score)
+                    self.cache(q1, q2, cached_similarity_score, overwrite=True)
                 return cached_similarity_score
             kgtk_similarity_value = self.get('kgtk_similarity_value', q1, q2)
             if kgtk_similarity_value > similarity:
@@ -577,35 +813,34 @@ class Similarity(Object):
         return similarity
 
     def get_kgtk_similarity_value(self, q1, q2):
-        url = self.get('KGTK_SIMILARITY_SERVICE_API')
-        similarity = []
-        for similarity_type in self.get('SIMILARITY_TYPES'):
-            while True:
-                try:
-                    resp = requests.get(url,
-                                        params={
-                                            'q1': q1,
-                                            'q2': q2,
-                                            'similarity_type': similarity_type})
-                    break
-                except Exception as exception:
-                    print('Exception: {}'.format(exception))
-                    print('retrying ...')
-                    time.sleep(5)
-            json_struct = json.loads(resp.text)
-            if 'error' not in json_struct:
-                similarity.append(1.0 if json_struct.get('similarity') > 1.0 else json_struct.get('similarity'))
-        return self.get('combine')(similarity) if len(similarity) else 0.0
+        return self.get('kgtk_similarity_client').get('similarity', q1, q2)
 
     def passes_filter(self, cluster_type):
+        # the verdict for a cluster type does not change, and is therefore computed only once
+        filter_verdicts = self.get('filter_verdicts')
+        if cluster_type not in filter_verdicts:
+            filter_verdicts[cluster_type] = self.apply_filter(cluster_type)
+        return filter_verdicts[cluster_type]
+
+    def apply_filter(self, cluster_type):
         taggable_dwd_ontology = self.get('taggable_dwd_ontology')
         if taggable_dwd_ontology.passes_filter(cluster_type):
             return True
-        for taggable_dwd_type in taggable_dwd_ontology.get('taggable_dwd_types'):
+        taggable_dwd_types = list(taggable_dwd_ontology.get('taggable_dwd_types'))
+        kgtk_similarity_client = self.get('kgtk_similarity_client')
+        for i, taggable_dwd_type in enumerate(taggable_dwd_types):
+            if kgtk_similarity_client is not None:
+                # request ahead the similarities that might be needed next
+                max_requests = kgtk_similarity_client.get('max_requests')
+                self.request_ahead([(cluster_type, t) for t in taggable_dwd_types[i:i+max_requests]])
             if self.similarity(cluster_type, taggable_dwd_type) > self.get('alpha'):
                 return True
         return False
 
+    def request_ahead(self, qnode_pairs):
+        qnode_pairs_to_request = [(q1, q2) for (q1, q2) in qnode_pairs if self.is_kgtk_similarity_needed(q1, q2)]
+        self.get('kgtk_similarity_client').request_ahead(qnode_pairs_to_request)
+
 class TaggableDWDOntology(Object):
     def __init__(self, logger, taggable_ldc_ontology_filename, overlay_filename):
         self.logger = logger
@@ -621,16 +856,20 @@ class TaggableDWDOntology(Object):
                 if ldc_type in self.type_mappings.get('mapping'):
                     for mapped_dwd_type in self.type_mappings.get('mapping').get(ldc_type):
                         self.taggable_dwd_types.setdefault(mapped_dwd_type, set()).add(ldc_type)
+        # the types passing the filter: the taggable dwd types, and their synonyms
+        self.passing_types = set(self.taggable_dwd_types)
+        synonyms = self.get('type_mappings').get('synonyms')
+        for t1 in synonyms:
+            for t2 in synonyms.get(t1):
+                if t1 in self.taggable_dwd_types:
+                    self.passing_types.add(t2)
+                if t2 in self.taggable_dwd_types:
+                    self.passing_types.add(t1)
 
     def passes_filter(self, cluster_type):
         # a cluster passes filter if the cluster_type is a taggable dwd type
         # or it is a synonym of a taggable dwd type
-        if cluster_type in self.get('taggable_dwd_types'):
-            return True
-        for taggable_dwd_type in self.get('taggable_dwd_types'):
-            if self.is_synonym(cluster_type, taggable_dwd_type):
-                return True
-        return False
+        return cluster_type in self.get('passing_types')
 
     def is_near_neighbor(self, q1, q2):
         near_neighbors = self.get('type_mappings').get('near_neighbors')
@@ -692,15 +931,18 @@ def filter_responses(args):
         'video': video_boundaries
         }
     taggable_dwd_ontology = TaggableDWDOntology(logger, args.taggable_ldc_ontology, args.overlay)
-    system_responses = ResponseSet(logger, document_mappings, document_boundaries, args.input, args.runid, 'task1')
-    gold_responses = ResponseSet(logger, document_mappings, document_boundaries, args.gold, 'gold', 'task1')
-    similarity = Similarity(logger, taggable_dwd_ontology, args.alpha, LOCK=args.lock, ACQUIRE_LOCK_WAIT=args.wait, NN_SIMILARITY_SCORE=args.near_neighbor_similarity_value, SIMILARITY_TYPES=args.similarity_types, KGTK_SIMILARITY_SERVICE_API=args.kgtk_api, CACHE=args.cache)
-    alignment = AlignClusters(logger, document_mappings, similarity, {'gold': gold_responses, 'system': system_responses}, IOU_THRESHOLDS=args.iou_thresholds, MIN_TYPE_SIMILARITY=args.min_type_similarity)
-    response_filter = ResponseFilter(logger, alignment, similarity)
+    system_responses = ResponseSet(logger, document_mappings, document_boundaries, args.input, args.runid, 'task1', cache_directory=args.responses_cache)
+    gold_responses = ResponseSet(logger, document_mappings, document_boundaries, args.gold, 'gold', 'task1', cache_directory=args.responses_cache)
+    similarity = Similarity(logger, taggable_dwd_ontology, args.alpha, LOCK=args.lock, ACQUIRE_LOCK_WAIT=args.wait, NN_SIMILARITY_SCORE=args.near_neighbor_similarity_value, SIMILARITY_TYPES=args.similarity_types, KGTK_SIMILARITY_SERVICE_API=args.kgtk_api, KGTK_MAX_REQUESTS=args.kgtk_requests, CACHE=args.cache, STORE=args.similarity_store)
+    alignment = AlignClusters(logger, document_mappings, similarity, {'gold': gold_responses, 'system': system_responses}, IOU_THRESHOLDS=args.iou_thresholds, MIN_TYPE_SIMILARITY=args.min_type_similarity, jobs=args.jobs)
+    response_filter = ResponseFilter(logger, alignment, similarity, jobs=args.jobs)
     response_filter.apply(system_responses)
     # write alignment and similarities
     alignment.print_similarities(args.similarities)
     alignment.print_alignment(args.alignment)
+    if similarity.get('kgtk_similarity_client') is not None:
+        # the similarities requested ahead but not needed are no longer requested
+        similarity.get('kgtk_similarity_client').close()
     # write filtered output
     os.mkdir(args.output)
     for input_filename in system_responses:
@@ -731,10 +973,14 @@ if __name__ == '__main__':
     parser.add_argument('-i', '--iou_thresholds',
                         default='eng:image:0.1,eng:text:0.1,eng:video:0.1,rus:image:0.1,rus:text:0.1,rus:video:0.1,spa:image:0.1,spa:text:0.1,spa:video:0.1,ukr:image:0.1,ukr:text:0.1,ukr:video:0.1',
                         help='Specify comma-separted list of document, modality, and the respective iou threshold separated by colon (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Specify the number of documents (or files) to be processed in parallel when aligning clusters, printing similarities and applying the filter (default: %(default)s)')
     parser.add_argument('-k', '--kgtk_api', default=None, help='Specify the URL of kgtk-similarity or leave it None (default: %(default)s)')
     parser.add_argument('-L', '--lock', default='/data/AUX-data/kgtk.lock', help='Specify the lock file (default: %(default)s)')
     parser.add_argument('-m', '--min_type_similarity', type=float, default=0.2, help='Specify the minimum type similarity required (default: %(default)s)')
+    parser.add_argument('-r', '--kgtk_requests', type=int, default=4, help='Specify the maximum number of concurrent requests to kgtk-similarity (default: %(default)s)')
+    parser.add_argument('-R', '--responses_cache', default=None, help='Specify a directory used for caching the loaded responses (default: %(default)s)')
     parser.add_argument('-n', '--near_neighbor_similarity_value', type=float, default=0.9, help='Specify the similarity score to be used when the qnodes were declared to be near-neighbors (default: %(default)s)')
+    parser.add_argument('-S', '--similarity_store', default=None, help='Specify the SQLite qnode type similarity store to be used, instead of the lock, for sharing the cache across concurrent runs; the cache, if specified, is imported into the store and exported from it (default: %(default)s)')
     parser.add_argument('-s', '--similarity_types', default='complex,transe,text,class,jc,topsim', help='Specify the comma-separated list of similarity types to be used by kgtk-similarity (default: %(default)s)')
     parser.add_argument('-w', '--wait', type=int, default=10, help='Specify the seconds to wait before checking if the lock can be acquired (default: %(default)s)')
     parser.add_argument('log_specifications', type=str, help='File containing error specifications')
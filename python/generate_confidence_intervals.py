@@ -51,7 +51,8 @@ def generate_confidence_intervals(args):
                                               document_id_col=args.document_id,
                                               run_id_col=args.run_id,
                                               sizes=args.sizes,
-                                              seed_value=args.seed)
+                                              seed_value=args.seed,
+                                              jobs=args.jobs)
     output = {'pretty': args.pretty_output, 'tab': args.tab_output}
     for output_format in output:
         fh = open(output[output_format], 'w')
@@ -61,6 +62,9 @@ def generate_confidence_intervals(args):
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Align system and gold clusters")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Specify the number of worker processes used for computing \
+                              confidence intervals (default: %(default)s)')
     parser.add_argument('-l', '--log', default='log.txt',
                         help='Specify a file to which log output should \
                               be redirected (default: %(default)s)')
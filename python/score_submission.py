@@ -24,7 +24,9 @@ from aida.text_boundaries import TextBoundaries
 from aida.type_similarities import TypeSimilarities
 from aida.video_boundaries import VideoBoundaries
 
+from concurrent.futures import ProcessPoolExecutor
 import argparse
+import multiprocessing
 import os
 import re
 import sys
@@ -34,6 +36,9 @@ import traceback
 ALLOK_EXIT_CODE = 0
 ERROR_EXIT_CODE = 255
 
+# the Task3Batch scorer used by a worker process
+WORKER_TASK3_BATCH = None
+
 def check_for_paths_existance(paths):
     for path in paths:
         if not os.path.exists(path):
@@ -50,7 +55,7 @@ class Task1(Object):
     """
     Class representing Task1 scorer.
     """
-    def __init__(self, log, runid, log_specifications, encodings, core_documents, parent_children, sentence_boundaries, image_boundaries, keyframe_boundaries, video_boundaries, gold, system, alignment, similarities, scores):
+    def __init__(self, log, jobs, responses_cache, runid, log_specifications, encodings, core_documents, parent_children, sentence_boundaries, image_boundaries, keyframe_boundaries, video_boundaries, gold, system, alignment, similarities, scores):
         check_for_paths_existance([
                  log_specifications,
                  encodings,
@@ -67,6 +72,8 @@ class Task1(Object):
                  ])
         check_for_paths_non_existance([scores])
         self.log_filename = log
+        self.jobs = jobs
+        self.responses_cache = responses_cache
         self.runid = runid
         self.log_specifications = log_specifications
         self.encodings = encodings
@@ -101,8 +108,8 @@ class Task1(Object):
             'keyframe': keyframe_boundaries,
             'video': video_boundaries
             }
-        gold_responses = ResponseSet(logger, document_mappings, document_boundaries, self.get('gold'), 'gold', 'task1')
-        system_responses = ResponseSet(logger, document_mappings, document_boundaries, self.get('system'), self.get('runid'), 'task1')
+        gold_responses = ResponseSet(logger, document_mappings, document_boundaries, self.get('gold'), 'gold', 'task1', jobs=self.get('jobs'), cache_directory=self.get('responses_cache'))
+        system_responses = ResponseSet(logger, document_mappings, document_boundaries, self.get('system'), self.get('runid'), 'task1', jobs=self.get('jobs'), cache_directory=self.get('responses_cache'))
         cluster_alignment = ClusterAlignment(logger, os.path.join(self.get('alignment'), 'cluster'))
         mention_alignment = MentionAlignment(logger, os.path.join(self.get('alignment'), 'mention'))
         type_similarities = TypeSimilarities(logger, self.get('similarities'))
@@ -124,6 +131,8 @@ class Task1(Object):
     @classmethod
     def add_arguments(myclass, parser):
         parser.add_argument('-l', '--log', default='log.txt', help='Specify a file to which log output should be redirected (default: %(default)s)')
+        parser.add_argument('-j', '--jobs', type=int, default=1, help='Specify the number of worker processes used for loading the responses (default: %(default)s)')
+        parser.add_argument('-R', '--responses_cache', default=None, help='Specify a directory used for caching the loaded responses (default: %(default)s)')
         parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__, help='Print version number and exit')
         parser.add_argument('log_specifications', type=str, help='File containing error specifications')
         parser.add_argument('encodings', type=str, help='File containing list of encoding to modality mappings')
@@ -146,7 +155,7 @@ class Task2(Object):
     """
     Class representing Task2 scorer.
     """
-    def __init__(self, log, runid, cutoff, normalize, weighted, log_specifications, encodings, core_documents, parent_children, sentence_boundaries, image_boundaries, keyframe_boundaries, video_boundaries, queries_to_score, assessments, responses, scores):
+    def __init__(self, log, responses_cache, runid, cutoff, normalize, weighted, log_specifications, encodings, core_documents, parent_children, sentence_boundaries, image_boundaries, keyframe_boundaries, video_boundaries, queries_to_score, assessments, responses, scores):
         check_for_paths_existance([
                  log_specifications,
                  encodings,
@@ -163,6 +172,7 @@ class Task2(Object):
                  ])
         check_for_paths_non_existance([scores])
         self.log_filename = log
+        self.responses_cache = responses_cache
         self.runid = runid
         self.cutoff = cutoff
         self.normalize = normalize
@@ -204,7 +214,7 @@ class Task2(Object):
             queries_to_score[entry.get('query_id')] = entry
 
         assessments = Assessments(logger, 'task2', queries_to_score, self.get('assessments'))
-        responses = ResponseSet(logger, document_mappings, document_boundaries, self.get('responses'), self.get('runid'), task='task2')
+        responses = ResponseSet(logger, document_mappings, document_boundaries, self.get('responses'), self.get('runid'), task='task2', cache_directory=self.get('responses_cache'))
         arguments = {
             'run_id': self.get('runid'),
             'cutoff': self.get('cutoff'),
@@ -225,6 +235,7 @@ class Task2(Object):
         parser.add_argument('-C', '--cutoff', action='store_true', help='Apply cutoff?')
         parser.add_argument('-N', '--normalize', action='store_true', help='Normalize confidences?')
         parser.add_argument('-W', '--weighted', action='store_true', help='Use weighted Value for AP computation?')
+        parser.add_argument('-R', '--responses_cache', default=None, help='Specify a directory used for caching the loaded responses (default: %(default)s)')
         parser.add_argument('log_specifications', type=str, help='File containing error specifications')
         parser.add_argument('encodings', type=str, help='File containing list of encoding-to-modality mappings')
         parser.add_argument('core_documents', type=str, help='File containing list of core documents')
@@ -245,7 +256,7 @@ class Task3(Object):
     """
     Class representing Task3 scorer.
     """
-    def __init__(self, log, runid, log_specifications, encodings, core_documents, parent_children, sentence_boundaries, image_boundaries, keyframe_boundaries, video_boundaries, queries, queries_to_score, query_claim_frames, claim_mappings, assessments, responses, assessments_wc, scores):
+    def __init__(self, log, events, runid, log_specifications, encodings, core_documents, parent_children, sentence_boundaries, image_boundaries, keyframe_boundaries, video_boundaries, queries, queries_to_score, query_claim_frames, claim_mappings, assessments, responses, assessments_wc, scores):
         check_for_paths_existance([
                  log_specifications,
                  encodings,
@@ -264,6 +275,7 @@ class Task3(Object):
                  ])
         check_for_paths_non_existance([assessments_wc, scores])
         self.log_filename = log
+        self.events_filename = events
         self.runid = runid
         self.log_specifications = log_specifications
         self.encodings = encodings
@@ -283,14 +295,35 @@ class Task3(Object):
         self.scores = scores
         self.logger = Logger(self.get('log_filename'),
                         self.get('log_specifications'),
-                        sys.argv)
+                        sys.argv,
+                        events_filename=self.get('events_filename'))
 
     def __call__(self):
+        logger = self.get('logger')
+        queries_to_score = self.get('queries_to_score_entries')
+        assessments = self.get('assessments_working_copy', queries_to_score)
+        arguments = {
+            'run_id': self.get('runid'),
+            'assessments': assessments,
+            'responses_dir': self.get('responses'),
+            'queries_to_score': queries_to_score,
+            }
+        scores = ScoresManager(logger, 'task3', arguments)
+        scores.print_scores(self.get('scores'))
+        exit(ALLOK_EXIT_CODE)
+
+    def get_queries_to_score_entries(self):
         logger = self.get('logger')
         queries_to_score = {}
         for entry in FileHandler(logger, self.get('queries_to_score')):
             queries_to_score[entry.get('query_id')] = entry
+        return queries_to_score
 
+    def get_assessments_working_copy(self, queries_to_score):
+        """
+        Writes the working copy of the assessments package, and returns the assessments loaded from it.
+        """
+        logger = self.get('logger')
         assessments_package=self.get('assessments')
         assessments_dir = self.get('assessments_wc')
         claims_dir = os.path.join(assessments_dir, 'claims')
@@ -321,19 +354,11 @@ class Task3(Object):
         os.system(command)
         claim_relations = os.path.join(assessments_dir, 'cross_claim_relations.tab')
 
-        assessments = Assessments(logger, 'task3', queries_to_score, claims_dir, claim_mappings=self.get('claim_mappings'), claim_relations=claim_relations)
-        arguments = {
-            'run_id': self.get('runid'),
-            'assessments': assessments,
-            'responses_dir': self.get('responses'),
-            'queries_to_score': queries_to_score,
-            }
-        scores = ScoresManager(logger, 'task3', arguments)
-        scores.print_scores(self.get('scores'))
-        exit(ALLOK_EXIT_CODE)
+        return Assessments(logger, 'task3', queries_to_score, claims_dir, claim_mappings=self.get('claim_mappings'), claim_relations=claim_relations)
 
     @classmethod
     def add_arguments(myclass, parser):
+        parser.add_argument('-e', '--events', default=None, help='Specify a file to which the events written to the log should also be written as gzip-compressed JSON records for analyze_logfile.py (default: %(default)s)')
         parser.add_argument('-l', '--log', default='log.txt', help='Specify a file to which log output should be redirected (default: %(default)s)')
         parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__, help='Print version number and exit')
         parser.add_argument('log_specifications', type=str, help='File containing error specifications')
@@ -356,10 +381,110 @@ class Task3(Object):
         parser.set_defaults(myclass=myclass)
         return parser
 
+def init_task3_batch_worker(task3_batch):
+    global WORKER_TASK3_BATCH
+    WORKER_TASK3_BATCH = task3_batch
+    task3_batch.get('logger').defer_events()
+
+def score_run_in_worker(runid):
+    return WORKER_TASK3_BATCH.score_run_in_worker(runid)
+
+class Task3Batch(Task3):
+    """
+    Class representing Task3 scorer for a batch of runs.
+
+    The assessments are loaded once, and used for scoring each of the runs found in the
+    responses directory. The scores of a run are written to the directory, named after the
+    run ID, inside the scores directory, and are identical to the scores written when the
+    run is scored alone. The events are recorded in a single log, in the order of run IDs.
+    """
+    def __init__(self, log, events, jobs, log_specifications, encodings, core_documents, parent_children, sentence_boundaries, image_boundaries, keyframe_boundaries, video_boundaries, queries, queries_to_score, query_claim_frames, claim_mappings, assessments, responses, assessments_wc, scores):
+        # the run IDs are those of the directories found in the responses directory
+        super().__init__(log, events, None, log_specifications, encodings, core_documents, parent_children, sentence_boundaries, image_boundaries, keyframe_boundaries, video_boundaries, queries, queries_to_score, query_claim_frames, claim_mappings, assessments, responses, assessments_wc, scores)
+        self.jobs = jobs
+
+    def __call__(self):
+        logger = self.get('logger')
+        queries_to_score = self.get('queries_to_score_entries')
+        self.shared_arguments = {
+            'assessments': self.get('assessments_working_copy', queries_to_score),
+            'queries_to_score': queries_to_score,
+            }
+        responses = self.get('responses')
+        runids = sorted([runid for runid in os.listdir(responses) if os.path.isdir(os.path.join(responses, runid))])
+        os.mkdir(self.get('scores'))
+        if self.get('jobs') > 1:
+            with ProcessPoolExecutor(max_workers=self.get('jobs'), mp_context=multiprocessing.get_context('fork'), initializer=init_task3_batch_worker, initargs=(self,)) as executor:
+                results = executor.map(score_run_in_worker, runids)
+                for runid in runids:
+                    deferred_events, error = next(results)
+                    if error is not None:
+                        # the runs not yet started are not scored, since the critical error
+                        # recorded below exits
+                        executor.shutdown(cancel_futures=True)
+                    logger.record_deferred_events(deferred_events)
+                    if error is not None:
+                        logger.record_event('DEFAULT_CRITICAL_ERROR', 'scoring {} failed\n{}'.format(runid, error))
+        else:
+            for runid in runids:
+                self.score_run(runid)
+        exit(ALLOK_EXIT_CODE)
+
+    def score_run(self, runid):
+        """
+        Scores the run, and writes its scores to the directory named after the run ID inside the scores directory.
+        """
+        arguments = {
+            'run_id': runid,
+            'responses_dir': os.path.join(self.get('responses'), runid),
+            }
+        arguments.update(self.get('shared_arguments'))
+        scores = ScoresManager(self.get('logger'), 'task3', arguments)
+        scores.print_scores(os.path.join(self.get('scores'), runid))
+
+    def score_run_in_worker(self, runid):
+        """
+        Scores the run, and returns the tuple (deferred_events, error).
+
+        This method is called in a worker process, which works on a copy of this instance.
+        """
+        error = None
+        try:
+            self.score_run(runid)
+        except BaseException:
+            error = traceback.format_exc()
+        return self.get('logger').get_deferred_events(), error
+
+    @classmethod
+    def add_arguments(myclass, parser):
+        parser.add_argument('-e', '--events', default=None, help='Specify a file to which the events written to the log should also be written as gzip-compressed JSON records for analyze_logfile.py (default: %(default)s)')
+        parser.add_argument('-j', '--jobs', type=int, default=1, help='Specify the number of worker processes used for scoring the runs (default: %(default)s)')
+        parser.add_argument('-l', '--log', default='log.txt', help='Specify a file to which log output should be redirected (default: %(default)s)')
+        parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__, help='Print version number and exit')
+        parser.add_argument('log_specifications', type=str, help='File containing error specifications')
+        parser.add_argument('encodings', type=str, help='File containing list of encoding-to-modality mappings')
+        parser.add_argument('core_documents', type=str, help='File containing list of core documents')
+        parser.add_argument('parent_children', type=str, help='File containing parent-to-child document ID mappings')
+        parser.add_argument('sentence_boundaries', type=str, help='File containing sentence boundaries')
+        parser.add_argument('image_boundaries', type=str, help='File containing image bounding boxes')
+        parser.add_argument('keyframe_boundaries', type=str, help='File containing keyframe bounding boxes')
+        parser.add_argument('video_boundaries', type=str, help='File containing length of videos')
+        parser.add_argument('queries', type=str, help='Specify the directory containing task3 user queries')
+        parser.add_argument('queries_to_score', type=str, help='File containing list of queryids to be scored')
+        parser.add_argument('query_claim_frames', type=str, help='Directory containing output of NIST evaluation docker when applied to query claim frames represented as a Condition5 run')
+        parser.add_argument('claim_mappings', type=str, help='File containing claim mappings (claim-mappings.tab)')
+        parser.add_argument('assessments', type=str, help='Directory containing the assessments package as recieved from LDC')
+        parser.add_argument('responses', type=str, help='Directory containing one directory per run, named after the run ID, containing output of AIDA evaluation docker')
+        parser.add_argument('assessments_wc', type=str, help='Directory to which the working copy of the assessments package should be written')
+        parser.add_argument('scores', type=str, help='Directory to which the scores of each run should be written, one directory per run')
+        parser.set_defaults(myclass=myclass)
+        return parser
+
 myclasses = [
     Task1,
     Task2,
-    Task3
+    Task3,
+    Task3Batch
     ]
 
 def main(args=sys.argv[1:]):
@@ -0,0 +1,177 @@
+"""
+Tests for the client of the KGTK similarity service, using a mock service.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida import kgtk_similarity_client
+from aida.kgtk_similarity_client import KGTKSimilarityClient
+from aida.logger import Logger
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+import unittest
+
+LOG_SPECIFICATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'input', 'aux_data', 'log_specifications.txt')
+
+def get_mock_similarity(q1, q2, similarity_type):
+    return round((sum(map(ord, '{}|{}|{}'.format(q1, q2, similarity_type))) % 100) / 100, 2)
+
+class MockKGTKSimilarityService(ThreadingHTTPServer):
+    """
+    The mock KGTK similarity service, which fails the first num_failures requests, and
+    every request if num_failures is None.
+    """
+
+    def __init__(self, num_failures=0, latency=0):
+        super().__init__(('127.0.0.1', 0), MockKGTKSimilarityServiceHandler)
+        self.num_failures = num_failures
+        self.latency = latency
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def record_request(self, request):
+        # returns True if the request is to be failed
+        with self.lock:
+            self.requests.append(request)
+            return self.num_failures is None or len(self.requests) <= self.num_failures
+
+    def get_url(self):
+        return 'http://127.0.0.1:{}/'.format(self.server_address[1])
+
+class MockKGTKSimilarityServiceHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, failed, body):
+        time.sleep(self.server.latency)
+        if failed:
+            self.send_response(503)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode('utf-8'))
+
+    def do_GET(self):
+        parameters = parse_qs(urlparse(self.path).query)
+        q1, q2, similarity_type = parameters['q1'][0], parameters['q2'][0], parameters['similarity_type'][0]
+        failed = self.server.record_request(('GET', q1, q2, similarity_type))
+        self.respond(failed, {'similarity': get_mock_similarity(q1, q2, similarity_type)})
+
+    def do_POST(self):
+        similarity_types = parse_qs(urlparse(self.path).query)['similarity_types'][0].split(',')
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        message = BytesParser().parsebytes('Content-Type: {}\r\n\r\n'.format(self.headers['Content-Type']).encode('utf-8') + body)
+        contents = message.get_payload()[0].get_payload(decode=True).decode('utf-8')
+        qnode_pairs = [tuple(line.split('\t')) for line in contents.splitlines()[1:]]
+        failed = self.server.record_request(('POST', tuple(qnode_pairs)))
+        rows = []
+        for q1, q2 in qnode_pairs:
+            row = {'q1': q1, 'q2': q2}
+            for similarity_type in similarity_types:
+                row[similarity_type] = get_mock_similarity(q1, q2, similarity_type)
+            rows.append(row)
+        # the batch API returns the JSON representation of its dataframe as a JSON string
+        self.respond(failed, json.dumps(rows))
+
+class TestKGTKSimilarityClient(unittest.TestCase):
+
+    similarity_types = ['class', 'jc']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.logger = Logger(os.path.join(cls.directory.name, 'log.txt'), LOG_SPECIFICATIONS, ['test_kgtk_similarity_client.py'])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.initial_backoff = kgtk_similarity_client.INITIAL_BACKOFF
+        kgtk_similarity_client.INITIAL_BACKOFF = 0.01
+        self.services = []
+        self.clients = []
+
+    def tearDown(self):
+        kgtk_similarity_client.INITIAL_BACKOFF = self.initial_backoff
+        for client in self.clients:
+            client.close()
+        for service in self.services:
+            service.shutdown()
+            service.server_close()
+
+    def get_client(self, num_failures=0, latency=0, max_attempts=3):
+        service = MockKGTKSimilarityService(num_failures=num_failures, latency=latency)
+        threading.Thread(target=service.serve_forever, daemon=True).start()
+        self.services.append(service)
+        client = KGTKSimilarityClient(self.logger, service.get_url(), self.similarity_types, statistics.mean, max_requests=4, max_attempts=max_attempts)
+        self.clients.append(client)
+        return service, client
+
+    def get_expected_similarity(self, q1, q2):
+        return statistics.mean([get_mock_similarity(q1, q2, similarity_type) for similarity_type in self.similarity_types])
+
+    def test_similarity(self):
+        service, client = self.get_client()
+        self.assertAlmostEqual(client.get('similarity', 'Q1', 'Q2'), self.get_expected_similarity('Q1', 'Q2'))
+        self.assertEqual(len(service.requests), len(self.similarity_types))
+
+    def test_batched_similarities(self):
+        service, client = self.get_client()
+        qnode_pairs = {('Q{}'.format(i), 'Q{}'.format(i + 1)) for i in range(2 * kgtk_similarity_client.BATCH_SIZE + 1)}
+        similarities = client.get('batched_similarities', qnode_pairs)
+        self.assertEqual(set(similarities), qnode_pairs)
+        for (q1, q2), similarity in similarities.items():
+            self.assertAlmostEqual(similarity, self.get_expected_similarity(q1, q2))
+        batches = [request[1] for request in service.requests]
+        self.assertEqual(sorted(len(batch) for batch in batches), [1, kgtk_similarity_client.BATCH_SIZE, kgtk_similarity_client.BATCH_SIZE])
+        self.assertEqual(sorted(qnode_pair for batch in batches for qnode_pair in batch), sorted(qnode_pairs))
+
+    def test_retry(self):
+        service, client = self.get_client(num_failures=2)
+        start = time.monotonic()
+        self.assertAlmostEqual(client.get('similarity', 'Q1', 'Q2'), self.get_expected_similarity('Q1', 'Q2'))
+        # the first request is sent three times, waiting for 0.01 and then 0.02 seconds
+        self.assertEqual(len(service.requests), 2 + len(self.similarity_types))
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+
+    def test_in_flight_requests(self):
+        service, client = self.get_client(latency=0.1)
+        client.request_ahead([('Q1', 'Q2'), ('Q1', 'Q3')])
+        client.request_ahead([('Q1', 'Q2')])
+        similarities = client.get('similarities', {('Q1', 'Q2'), ('Q1', 'Q3')})
+        self.assertAlmostEqual(similarities[('Q1', 'Q2')], self.get_expected_similarity('Q1', 'Q2'))
+        self.assertAlmostEqual(similarities[('Q1', 'Q3')], self.get_expected_similarity('Q1', 'Q3'))
+        self.assertEqual(len(service.requests), 2 * len(self.similarity_types))
+        # a pair whose similarity was returned is requested again
+        client.get('similarity', 'Q1', 'Q2')
+        self.assertEqual(len(service.requests), 3 * len(self.similarity_types))
+
+    def test_give_up(self):
+        service, client = self.get_client(num_failures=None, max_attempts=2)
+        with self.assertRaises(SystemExit):
+            client.get('similarity', 'Q1', 'Q2')
+        self.assertEqual(len(service.requests), 2)
+
+    def test_give_up_batch(self):
+        service, client = self.get_client(num_failures=None, max_attempts=2)
+        with self.assertRaises(SystemExit):
+            client.get('batched_similarities', {('Q1', 'Q2')})
+        self.assertEqual(len(service.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for the AIDA utility functions.
+"""
+
+__author__  = "Shahzad Rajput <shahzad.rajput@nist.gov>"
+__status__  = "production"
+__version__ = "0.0.0.1"
+__date__    = "18 October 2026"
+
+from aida import utility
+from munkres import Munkres
+
+import random
+import unittest
+
+def get_similarities_and_mappings(matrix):
+    similarities = {}
+    mappings = {
+        'gold': {'id_to_index': {}, 'index_to_id': {}},
+        'system': {'id_to_index': {}, 'index_to_id': {}}
+        }
+    for index_a, row in enumerate(matrix):
+        id_a = 'gold-{}'.format(index_a)
+        mappings['gold']['id_to_index'][id_a] = index_a
+        mappings['gold']['index_to_id'][index_a] = id_a
+        similarities[id_a] = {}
+        for index_b, similarity in enumerate(row):
+            id_b = 'system-{}'.format(index_b)
+            mappings['system']['id_to_index'][id_b] = index_b
+            mappings['system']['index_to_id'][index_b] = id_b
+            similarities[id_a][id_b] = similarity
+    return similarities, mappings
+
+def get_munkres_assignment(similarities, mappings):
+    # the pairs, having a non-zero similarity, assigned by Munkres on the full cost matrix
+    assignment = []
+    for index_a, index_b in Munkres().compute(utility.get_cost_matrix(similarities, mappings)):
+        if similarities[mappings['gold']['index_to_id'][index_a]][mappings['system']['index_to_id'][index_b]] > 0:
+            assignment.append((index_a, index_b))
+    return sorted(assignment)
+
+class TestGetAssignment(unittest.TestCase):
+
+    def assert_same_as_munkres(self, matrix):
+        similarities, mappings = get_similarities_and_mappings(matrix)
+        self.assertEqual(utility.get_assignment(similarities, mappings), get_munkres_assignment(similarities, mappings), matrix)
+
+    def assert_random_matrices_same_as_munkres(self):
+        generator = random.Random(0)
+        for _ in range(1000):
+            num_rows, num_columns = generator.randint(1, 7), generator.randint(1, 7)
+            matrix = [[generator.choice([0, 0, 0, 0.3, 0.5, 1, 1, 2]) for _ in range(num_columns)] for _ in range(num_rows)]
+            if any(similarity > 0 for row in matrix for similarity in row):
+                self.assert_same_as_munkres(matrix)
+
+    def test_tie(self):
+        self.assert_same_as_munkres([[0, 0], [1, 1]])
+        self.assert_same_as_munkres([[1, 1], [1, 1]])
+
+    def test_unique(self):
+        self.assert_same_as_munkres([[0.9, 0.1, 0], [0.2, 0.8, 0], [0, 0, 0.5]])
+
+    def test_random_matrices(self):
+        self.assert_random_matrices_same_as_munkres()
+
+    def test_random_matrices_without_scipy(self):
+        linear_sum_assignment = utility.linear_sum_assignment
+        utility.linear_sum_assignment = None
+        try:
+            self.assert_random_matrices_same_as_munkres()
+        finally:
+            utility.linear_sum_assignment = linear_sum_assignment
+
+if __name__ == '__main__':
+    unittest.main()
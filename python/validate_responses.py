@@ -69,7 +69,7 @@ def validate_responses(args):
         }
 
     queries = TA3QuerySet(logger, args.queries) if args.queries else None
-    responses = ResponseSet(logger, document_mappings, document_boundaries, args.input, args.runid, args.task, queries=queries)
+    responses = ResponseSet(logger, document_mappings, document_boundaries, args.input, args.runid, args.task, queries=queries, cache_directory=args.responses_cache)
     responses.write_valid_responses(args.output)
     num_warnings, num_errors = logger.get_stats()
     closing_message = 'validation finished (warnings:{}, errors:{})'.format(num_warnings, num_errors)
@@ -85,6 +85,7 @@ if __name__ == '__main__':
     parser.add_argument('-v', '--version', action='version', version='%(prog)s ' + __version__, help='Print version number and exit')
     parser.add_argument('-t', '--task', default='task1', choices=['task1', 'task2', 'task3'], help='Specify task1 or task2 or task3 (default: %(default)s)')
     parser.add_argument('-q', '--queries', help='Specify the directory containing task3 user queries')
+    parser.add_argument('-R', '--responses_cache', default=None, help='Specify a directory used for caching the loaded responses (default: %(default)s)')
     parser.add_argument('log_specifications', type=str, help='File containing error specifications')
     parser.add_argument('encodings', type=str, help='File containing list of encoding to modality mappings')
     parser.add_argument('core_documents', type=str, help='File containing list of core documents to be included in the pool')